@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Function: offline benchmark of the main pipeline, against a local stand-in of the YouTube API and DingTalk
+# Usage: python3 -m benchmark.bench --authors 500 --articles 20 --latency 0.02 --output benchmark_results.json
+#        python3 -m benchmark.bench --baseline benchmark_results.json  (exit 1 on regression)
+# Author: 10935336
+# Creation date: 2026-10-18
+# Modified date: 2026-10-18
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import main
+from benchmark.fake_server import FakeApiServer
+from benchmark.synthetic import generate_articles_lists, generate_authors_list
+from module import DingTalkRobot
+from module.ArticleArchive import ArticleArchive
+from module.PushedRecords import PushedRecords
+from module.Outbox import Outbox
+from module.SnapshotStore import SnapshotStore
+from module.SummaryAggregator import SummaryAggregator
+
+
+def measure(func, setup=None, teardown=None, repeat=3):
+    """
+    Time func(state) repeat times, state comes from setup() which is not timed.
+
+    :return: {'seconds': [], 'min': 0.0, 'median': 0.0}
+    """
+    seconds = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start_time = time.perf_counter()
+        func(state)
+        seconds.append(time.perf_counter() - start_time)
+        if teardown:
+            teardown(state)
+    return {'seconds': seconds, 'min': min(seconds), 'median': statistics.median(seconds)}
+
+
+def write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as w:
+        json.dump(data, w, ensure_ascii=False)
+
+
+def run_benchmark(authors, articles, latency, repeat, work_dir):
+    server = FakeApiServer(articles_per_author=articles, latency=latency).start()
+    results = {}
+
+    try:
+        # spiders_init
+        spiders_list = [{'spider_id': 'YoutubeSpider', 'object_name': 'youtube'}]
+        results['spiders_init'] = measure(lambda state: main.spiders_init(spiders_list), repeat=repeat)
+
+        # get_all_current_articles_lists, against the fake YouTube API
+        authors_list_path = os.path.join(work_dir, 'youtube_authors_list.json')
+        api_key_path = os.path.join(work_dir, 'youtube_apikey_list.json')
+        write_json(authors_list_path, generate_authors_list(authors))
+        write_json(api_key_path, [{'api_key': 'benchmark', 'daily_quota': 10 ** 9}])
+
+        def make_spider(data_dir):
+            spider = main.spiders_init(spiders_list)[0]
+            spider.api_base_url = server.base_url + '/youtube/v3/'
+            spider.data_dir = data_dir
+            start = spider.start
+            spider.start = lambda: start(authors_list_path=authors_list_path, api_key_path=api_key_path)
+            return spider
+
+        def new_data_dir():
+            return tempfile.mkdtemp(dir=work_dir)
+
+        # First run of a spider: channel resolution and full pages
+        results['get_all_current_articles_lists_cold'] = measure(
+            lambda spider: main.get_all_current_articles_lists([spider]),
+            setup=lambda: make_spider(new_data_dir()), repeat=repeat)
+
+        # Later runs: cursors and caches are warm, two new uploads per author
+        warm_data_dir = new_data_dir()
+        warm_spider = make_spider(warm_data_dir)
+        main.get_all_current_articles_lists([warm_spider])
+
+        def warm_setup():
+            server.offset += 2
+            return warm_spider
+
+        results['get_all_current_articles_lists_warm'] = measure(
+            lambda spider: main.get_all_current_articles_lists([spider]), setup=warm_setup, repeat=repeat)
+
+        # Later runs without new uploads, the playlist pages are revalidated with their ETag
+        results['get_all_current_articles_lists_unchanged'] = measure(
+            lambda spider: main.get_all_current_articles_lists([spider]), setup=lambda: warm_spider, repeat=repeat)
+
+        # get_new_articles, against a snapshot of the previous run, and again when nothing changed
+        previous_articles_lists = generate_articles_lists(authors, articles, spiders=3)
+        current_articles_lists = generate_articles_lists(authors, articles, spiders=3, new_per_author=2)
+
+        def snapshot_setup():
+            snapshot_store = SnapshotStore(os.path.join(new_data_dir(), 'previous_articles.sqlite3'))
+            snapshot_store.update(previous_articles_lists)
+            return snapshot_store
+
+        results['get_new_articles'] = measure(
+            lambda snapshot_store: main.get_new_articles(current_articles_lists, snapshot_store),
+            setup=snapshot_setup, teardown=SnapshotStore.close, repeat=repeat)
+
+        def unchanged_snapshot_setup():
+            snapshot_store = snapshot_setup()
+            snapshot_store.update(current_articles_lists)
+            return snapshot_store
+
+        results['get_new_articles_unchanged'] = measure(
+            lambda snapshot_store: main.get_new_articles(current_articles_lists, snapshot_store),
+            setup=unchanged_snapshot_setup, teardown=SnapshotStore.close, repeat=repeat)
+
+        # push_new_articles, queued in the outbox and delivered to the fake DingTalk robot
+        snapshot_store = snapshot_setup()
+        new_articles = main.get_new_articles(current_articles_lists, snapshot_store)
+        snapshot_store.close()
+        dingtalk_bot_conf_path = os.path.join(work_dir, 'dingtalk_bot_conf.json')
+        write_json(dingtalk_bot_conf_path, [{'webhook': server.base_url + '/robot/send?access_token=benchmark',
+                                             'secret': '', 'name': 'benchmark', 'pack_articles': True}])
+        sinks = DingTalkRobot.DingTalkRobot(dingtalk_bot_conf_path).get_sinks()
+        # Measure the pipeline, not DingTalk's 20 messages per minute
+        DingTalkRobot.rate_limiters[server.base_url + '/robot/send?access_token=benchmark'] = \
+            DingTalkRobot.SlidingWindowLimiter(10 ** 9, 60)
+
+        def push_setup():
+            push_dir = new_data_dir()
+            return (PushedRecords(os.path.join(push_dir, 'records.sqlite3')),
+                    Outbox(os.path.join(push_dir, 'outbox.sqlite3')))
+
+        def push(state):
+            records, outbox = state
+            main.push_new_articles(new_articles, push_func=None, current_time=datetime.now(), records=records,
+                                   outbox=outbox, sink_names=list(sinks))
+            outbox.deliver(sinks)
+
+        def push_teardown(state):
+            for store in state:
+                store.close()
+
+        results['push_new_articles'] = measure(push, setup=push_setup, teardown=push_teardown, repeat=repeat)
+
+        # get_articles_summary, from the snapshot and from the stored counters
+        results['get_articles_summary'] = measure(
+            lambda state: main.get_articles_summary(current_articles_lists), repeat=repeat)
+
+        aggregator = SummaryAggregator(os.path.join(new_data_dir(), 'counters.sqlite3'))
+        results['summary_aggregator_add'] = measure(lambda state: aggregator.add(current_articles_lists),
+                                                    repeat=repeat)
+        results['get_articles_summary_aggregator'] = measure(
+            lambda state: main.get_articles_summary(current_articles_lists, aggregator=aggregator), repeat=repeat)
+        aggregator.close()
+
+        # archive every article of a run, then summarize it
+        archive = ArticleArchive(os.path.join(new_data_dir(), 'archive.sqlite3'))
+        results['article_archive_add'] = measure(lambda state: archive.add(current_articles_lists), repeat=repeat)
+        results['get_articles_summary_archive'] = measure(
+            lambda state: main.get_articles_summary(current_articles_lists, aggregator=None, archive=archive),
+            repeat=repeat)
+        archive.close()
+
+        results['http_requests'] = dict(server.requests_count)
+    finally:
+        server.stop()
+
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    :return: ['scenario: median 1.0s > baseline 0.5s'] for every scenario slower than baseline * (1 + tolerance)
+    """
+    regressions = []
+    for name, result in results['scenarios'].items():
+        baseline_result = baseline.get('scenarios', {}).get(name)
+        if not isinstance(result, dict) or 'median' not in result or not baseline_result:
+            continue
+        if result['median'] > baseline_result['median'] * (1 + tolerance):
+            regressions.append(f"{name}: median {result['median']:.4f}s > baseline {baseline_result['median']:.4f}s")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Offline benchmark of the ArticleScraperBot pipeline')
+    parser.add_argument('--authors', type=int, default=200, help='number of synthetic authors')
+    parser.add_argument('--articles', type=int, default=20, help='articles per author')
+    parser.add_argument('--latency', type=float, default=0.01, help='simulated latency of each request in seconds')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='benchmark_results.json', help='where to write the results as JSON')
+    parser.add_argument('--baseline', help='results JSON of an earlier run, exit 1 if a scenario is slower')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown against the baseline')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    # Read the baseline first, it may be the same file as --output
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as r:
+            baseline = json.load(r)
+
+    work_dir = tempfile.mkdtemp(prefix='articlescraperbot-benchmark-')
+    try:
+        scenarios = run_benchmark(args.authors, args.articles, args.latency, args.repeat, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        'meta': {'time': int(time.time()), 'python': platform.python_version(), 'authors': args.authors,
+                 'articles': args.articles, 'latency': args.latency, 'repeat': args.repeat},
+        'scenarios': scenarios
+    }
+    write_json(args.output, results)
+
+    for name, result in scenarios.items():
+        if 'median' in result:
+            print(f"{name:40} median {result['median']:.4f}s  min {result['min']:.4f}s")
+    print(f"http requests: {scenarios['http_requests']}")
+
+    if baseline is not None:
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
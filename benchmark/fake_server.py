@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Function: local stand-in for the YouTube Data API and the DingTalk robot webhook, used by the benchmark
+# Author: 10935336
+# Creation date: 2026-10-18
+# Modified date: 2026-10-18
+
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmark.synthetic import generate_videos
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, without this keep-alive responses wait for delayed ACKs
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, body, status=200):
+        data = json.dumps(body).encode('utf-8')
+        # Like the YouTube API, answer 304 when the client already has this version
+        etag = '"' + hashlib.blake2b(data, digest_size=8).hexdigest() + '"'
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.server.count_request('304')
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        if status == 200:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.server.count_request(self.path)
+        time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path == '/youtube/v3/playlistItems':
+            self.send_json(self.server.playlist_items(query))
+        elif url.path == '/youtube/v3/channels':
+            self.send_json(self.server.channels(query))
+        else:
+            self.send_json({'error': {'code': 404, 'errors': [{'reason': 'notFound'}]}}, 404)
+
+    def do_POST(self):
+        self.server.count_request(self.path)
+        time.sleep(self.server.latency)
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if urlparse(self.path).path == '/robot/send':
+            self.send_json({'errcode': 0, 'errmsg': 'ok'})
+        else:
+            self.send_json({'errcode': 404, 'errmsg': 'not found'}, 404)
+
+
+class FakeApiServer(ThreadingHTTPServer):
+    """
+    Serves playlistItems and channels like the YouTube Data API and /robot/send like a DingTalk robot,
+    every request is delayed by latency seconds.
+
+    The uploads playlist of author i ("UU" + author id) holds articles_per_author videos, newest first,
+    raise offset to simulate new uploads.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, articles_per_author=20, latency=0.0, port=0):
+        super().__init__(('127.0.0.1', port), FakeApiHandler)
+        self.articles_per_author = articles_per_author
+        self.latency = latency
+        self.offset = 0
+        self.now = int(time.time())
+        self.requests_count = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def count_request(self, path):
+        endpoint = urlparse(path).path
+        with self.lock:
+            self.requests_count[endpoint] = self.requests_count.get(endpoint, 0) + 1
+
+    def playlist_items(self, query):
+        i = int(query['playlistId'][2:])
+        start = int(query.get('pageToken', 0))
+        max_results = int(query.get('maxResults', 5))
+        videos = generate_videos(i, self.articles_per_author, self.now, self.offset)
+
+        body = {'items': [
+            {'snippet': {'title': title, 'resourceId': {'videoId': video_id},
+                         'publishedAt': datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}}
+            for video_id, title, timestamp in videos[start:start + max_results]
+        ]}
+        if start + max_results < len(videos):
+            body['nextPageToken'] = str(start + max_results)
+        return body
+
+    def channels(self, query):
+        return {'items': [{'id': channel_id, 'contentDetails': {'relatedPlaylists': {'uploads': 'UU' + channel_id[2:]}}}
+                          for channel_id in query['id'].split(',')]}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Function: synthetic authors and articles for the benchmark
+# Author: 10935336
+# Creation date: 2026-10-18
+# Modified date: 2026-10-18
+
+import random
+import time
+
+from module.Article import Article
+
+TEAMS = ['Alpha', 'Beta', 'Gamma', 'Delta', 'Epsilon']
+
+
+def author_id(i):
+    # Looks like a YouTube channel id, so the uploads playlist is "UU" + author_id[2:]
+    return f'UC{i:022d}'
+
+
+def generate_authors_list(authors):
+    """
+    :return: [{'author_id': '', 'author_name': 'team-member'}] in the format of youtube_authors_list.json
+    """
+    return [{'author_id': author_id(i), 'author_name': f'{TEAMS[i % len(TEAMS)]}-member{i}'} for i in range(authors)]
+
+
+def generate_videos(i, articles_per_author, now, offset=0):
+    """
+    The videos of author i, newest first, one per hour, offset adds that many newer uploads.
+
+    The timestamp of video k only depends on k, the newest of the first articles_per_author is one hour
+    before now and the new uploads follow it, so a new upload is always newer than a cursor set earlier.
+
+    :return: [(video_id, title, timestamp)]
+    """
+    base = now - articles_per_author * 3600
+    return [(f'v{i}x{k}', f'Video {k} of author {i}', base + k * 3600)
+            for k in range(articles_per_author + offset - 1, -1, -1)]
+
+
+def generate_articles_lists(authors, articles_per_author, spiders=1, new_per_author=0, now=None, seed=0):
+    """
+    [[Article]] as returned by get_all_current_articles_lists(), authors are spread over the spiders.
+
+    :param new_per_author: shift every author by this many newer articles, to simulate the next run
+    """
+    rng = random.Random(seed)
+    now = int(time.time()) if now is None else now
+    articles_lists = [[] for _ in range(spiders)]
+
+    for i in range(authors):
+        channel_name = rng.choice(['Youtube', 'Youtube-Shorts', 'Blog'])
+        for video_id, title, timestamp in generate_videos(i, articles_per_author, now, new_per_author)[
+                                          :articles_per_author]:
+            articles_lists[i % spiders].append(
+                Article(
+                    title=title,
+                    article_id=video_id,
+                    author_name=f'{TEAMS[i % len(TEAMS)]}-member{i}',
+                    author_id=author_id(i),
+                    channel_name=channel_name,
+                    link='https://example.com/' + video_id,
+                    creation_time=str(timestamp),
+                    snapshot_time=str(now)
+                )
+            )
+
+    return [article_list for article_list in articles_lists if article_list]
@@ -2,18 +2,37 @@
 # -*- coding: utf-8 -*-
 # Author: 10935336
 # Creation date: 2023-04-20
-# Modified date: 2024-01-24
-
-import importlib
-import pickle
+# Modified date: 2026-10-18
+
+import argparse
+import contextlib
+import functools
+import json
+import os
+import queue
+import signal
 import site
 import logging
-from datetime import timedelta
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from logging.handlers import RotatingFileHandler
 from os.path import dirname, join, realpath
 
-# Change to dynamic loading in the future
-from module.DingTalkRobot import *
+from module.Article import Article, articles_from_json
+from module.ArticleArchive import ArticleArchive
+from module.BrowserPool import browser_pool
+from module.DuplicateIndex import DuplicateIndex, merge_group
+from module.Metrics import metrics
+from module.Outbox import Outbox
+from module.Profiler import profiler
+from module.PushedRecords import PushedRecords
+from module.SummaryAggregator import SummaryAggregator, split_team_and_channel
+from module.Scheduler import Scheduler
+from module.SnapshotStore import SnapshotStore
+from module.SpiderRegistry import spider_registry
+from module.WorkerCoordinator import WorkerCoordinator
 
 
 def load_spiders_list(spiders_list_path=None):
@@ -31,153 +50,300 @@ def load_spiders_list(spiders_list_path=None):
 
 
 def spiders_init(spiders_list):
-    try:
-        objects_list = []
+    """
+    Instantiate the spiders of spider_list.json, their modules are imported on first use by spider_registry.
+    A spider that cannot be loaded is skipped, the others are still returned.
 
-        for spider in spiders_list:
-            try:
-                spider_id_l = spider['spider_id']
-                object_name_l = spider['object_name']
-            except Exception as error:
-                logging.exception(f'Cannot find wanted value in spiders_list: {error}')
+    :return: [spider object, spider object]
+    """
+    objects_list = []
+    for spider in spiders_list or []:
+        object_ = spider_registry.create(spider)
+        if object_ is not None:
+            objects_list.append(object_)
+    return objects_list
 
-            # dynamic load module
-            try:
-                # module dir
-                module = importlib.import_module('module.' + spider_id_l)
-            except Exception as error:
-                logging.exception(f'Cannot load module: {error}')
 
-            # instantiating the object
-            try:
-                spider_class = getattr(module, spider_id_l)
-                globals()[object_name_l] = spider_class()
-                objects_list.append(globals()[object_name_l])
-            except Exception as error:
-                logging.exception(f'Instantiating the object error: {error}')
+def load_notifier_list(notifier_list_path=None):
+    """
+    :return: [{'notifier_id': 'DingTalkRobot', 'options': {}}], only DingTalk if notifier_list.json does not exist
+    """
+    if notifier_list_path is None:
+        module_dir = os.path.dirname(os.path.abspath(__file__))
+        notifier_list_path = os.path.join(module_dir, '.', 'conf', 'notifier_list.json')
+
+    if not os.path.exists(notifier_list_path):
+        return [{'notifier_id': 'DingTalkRobot'}]
 
-        return objects_list
+    try:
+        with open(notifier_list_path, 'r', encoding='utf-8') as r:
+            return json.load(r)
     except Exception as error:
-        logging.exception(f'Unexpected error in spiders_init(): {error}')
+        logging.exception(f'{notifier_list_path} read error: {error}')
+        return []
 
 
-def get_all_current_articles_lists(objects_list):
-    all_list = []
+def notifiers_init(notifier_list):
+    """
+    Instantiate the notifiers of notifier_list.json, loaded like the spiders (module/<notifier_id>.py,
+    class <notifier_id>) with "options" as keyword arguments.
+    A notifier that cannot be loaded is skipped, the others are still returned.
+
+    A notifier provides get_sinks() and get_summary_sinks(), {'sink_name': push function raising on failure}.
+
+    :return: [notifier object, notifier object]
+    """
+    notifiers = []
+    for notifier in notifier_list or []:
+        try:
+            notifier_class = spider_registry.get_class(notifier['notifier_id'])
+            notifiers.append(notifier_class(**notifier.get('options', {})))
+        except Exception as error:
+            logging.exception(f'Cannot load notifier {notifier}: {error}')
+    return notifiers
+
+
+def get_sinks(notifiers):
+    """
+    :return: {'sink_name': function taking [Article]} of every notifier
+    """
+    sinks = {}
+    for notifier in notifiers:
+        sinks.update(notifier.get_sinks())
+    return sinks
+
+
+def push_summary(notifiers, articles_summary):
+    """
+    Push the summary to every sink of every notifier concurrently, a failing sink does not affect the others.
+    """
+    summary_sinks = {}
+    for notifier in notifiers:
+        summary_sinks.update(notifier.get_summary_sinks())
+    if not summary_sinks:
+        return
+
+    def push(sink_name, push_func):
+        try:
+            push_func(articles_summary)
+            metrics.inc('articlescraperbot_sink_push_total', sink=sink_name, result='ok')
+        except Exception as error:
+            logging.exception(f'Push summary to {sink_name} error: {error}')
+            metrics.inc('articlescraperbot_sink_push_total', sink=sink_name, result='error')
+
+    with ThreadPoolExecutor(max_workers=len(summary_sinks), thread_name_prefix='summary') as executor:
+        for sink_name, push_func in summary_sinks.items():
+            executor.submit(push, sink_name, push_func)
+
+
+def run_spider(object_, results):
+    """
+    Run object_.start() and put (object_, articles_list) into the results queue.
+    Spiders that provide object_.articles ([Article]) are read directly,
+    older spiders that only provide object_.articles_json are decoded.
+    Any error is logged and reported as an empty list.
+    """
     try:
-        for object_ in objects_list:
-            logging.info(f"Now loading {object_}")
+        logging.info(f"Now loading {object_}")
+        with metrics.timer('articlescraperbot_spider_duration_seconds', spider=type(object_).__name__), \
+                profiler.section(f"spider {getattr(object_, 'object_name', type(object_).__name__)}"):
             object_.start()
-            if object_.articles_json:
-                all_list.append(json.loads(object_.articles_json))
+        articles_list = getattr(object_, 'articles', None)
+        if articles_list is None:
+            articles_list = articles_from_json(object_.articles_json) if object_.articles_json else []
+        metrics.inc('articlescraperbot_articles_total', len(articles_list), kind='fetched')
     except Exception as error:
-        logging.exception(f'Unexpected error in get_all_current_articles_lists(): {error}')
+        logging.exception(f'{object_} start() error: {error}')
+        articles_list = []
 
-    return json.dumps(all_list, ensure_ascii=False)
+    results.put((object_, articles_list))
 
 
-def get_new_articles(all_current_articles_lists, previous_articles_file_path='previous_articles.json',
-                     time_threshold=86400):
-    """
-    Get new articles from the given list of articles and save the new articles list to a file.
+# id(object_) -> (object_, threading.Thread) of the last start() of each spider, a spider cut off at its deadline
+# may still be running, it is not started again until that thread ends
+spider_threads = {}
+spider_threads_lock = threading.Lock()
 
-    time_threshold = days * 24 * 60 * 60
-    15 days = 1296000
-    3 days = 259200
-    1 day = 86400
 
-    :return [{},{}]
+def start_spider_thread(object_, results):
     """
-    if previous_articles_file_path is None:
-        module_dir = os.path.dirname(os.path.abspath(__file__))
-        previous_articles_file_path = os.path.join(module_dir, '.', 'previous_articles.json')
+    :return: True if object_ was started, False if its previous start() is still running
+    """
+    with spider_threads_lock:
+        previous = spider_threads.get(id(object_))
+        if previous is not None and previous[0] is object_ and previous[1].is_alive():
+            return False
+        thread = threading.Thread(target=run_spider, args=(object_, results), name=f'spider-{object_}', daemon=True)
+        spider_threads[id(object_)] = (object_, thread)
+        thread.start()
+        return True
+
 
+def get_all_current_articles_lists(objects_list, max_workers=4, timeout=600):
+    """
+    Run the spiders concurrently and collect their article lists in the order they finish.
+
+    At most max_workers spiders run at the same time, each in its own daemon thread.
+    Every spider has its own deadline, counted from the moment it starts,
+    the deadline is the spider's "timeout" attribute (from spider_list.json) or the timeout parameter.
+    A spider that misses its deadline is reported as [] and asked to stop through its cancel_event (if any),
+    the other spiders are not delayed by it.
+    A spider whose start() of an earlier call is still running is skipped and reported as [],
+    so two threads never run the same spider object.
+
+    :param objects_list: spider objects returned by spiders_init()
+    :param max_workers: maximum number of spiders running at the same time
+    :param timeout: default deadline of each spider in seconds
+    :return: [[Article, Article], [Article, Article]]
+    """
+    all_list = []
     try:
-        # Convert a JSON string to a Python list
-        current_articles_lists = json.loads(all_current_articles_lists)
+        pending = list(objects_list or [])
+        results = queue.Queue()
+        # id(object_) -> (object_, deadline)
+        running = {}
+
+        while pending or running:
+            # Start spiders until the pool is full
+            while pending and len(running) < max_workers:
+                object_ = pending.pop(0)
+                spider_timeout = getattr(object_, 'timeout', None) or timeout
+                if not start_spider_thread(object_, results):
+                    logging.error(f'{object_} is still running since its last deadline, skipped')
+                    continue
+                running[id(object_)] = (object_, time.monotonic() + spider_timeout)
 
-        # If the previous_articles_file_path file exists, read the JSON string in the file as json list
-        if os.path.exists(previous_articles_file_path):
+            if not running:
+                continue
+            next_deadline = min(deadline for _, deadline in running.values())
             try:
-                with open(previous_articles_file_path, 'r', encoding='utf-8') as f:
-                    previous_articles_lists = json.load(f)
-                    previous_authors_ids = set()
+                object_, articles_list = results.get(timeout=max(0.0, next_deadline - time.monotonic()))
+            except queue.Empty:
+                # Cut off every spider whose deadline has passed
+                now = time.monotonic()
+                for key, (object_, deadline) in list(running.items()):
+                    if deadline <= now:
+                        del running[key]
+                        cancel_event = getattr(object_, 'cancel_event', None)
+                        if cancel_event is not None:
+                            cancel_event.set()
+                        logging.error(f'{object_} timed out, it is set to []')
+                continue
+
+            # A spider that was already cut off finished late, ignore its result
+            if running.pop(id(object_), None) is None:
+                logging.warning(f'{object_} finished after its deadline, result ignored')
+                continue
+
+            if articles_list:
+                all_list.append(articles_list)
 
-                    for current_article_list in previous_articles_lists:
-                        for current_article in current_article_list:
-                            previous_authors_ids.add(current_article['author_id'])
+    except Exception as error:
+        logging.exception(f'Unexpected error in get_all_current_articles_lists(): {error}')
 
-            except json.JSONDecodeError as error:
-                logging.exception(f'JSON decode error: {error}')
-                previous_articles_lists = []
-                previous_authors_ids = set()
+    return all_list
 
-        else:
-            previous_articles_lists = []
-            previous_authors_ids = set()
 
-        new_articles = []
+def load_articles_lists(all_current_articles_lists):
+    """
+    Accept [[Article]] as returned by get_all_current_articles_lists() or the JSON string used before,
+    and return [[Article]].
+    """
+    if isinstance(all_current_articles_lists, str):
+        return [[Article.from_dict(article_dict) for article_dict in article_list]
+                for article_list in json.loads(all_current_articles_lists)]
+    return all_current_articles_lists
 
-        # Loop through each article in the current article list
-        for current_article_list in current_articles_lists:
-            for current_article in current_article_list:
-                is_new = True
 
-                # If the article_id acquisition fails, record an error and skip
-                if current_article['article_id'] is None:
-                    logging.error(f"article_id is null {current_article}")
-                    continue
+def find_new_articles(current_articles_lists, previous_articles_index, time_threshold=86400):
+    """
+    Compare the current article lists with the index returned by SnapshotStore.load_index(),
+    {'author_id': {'article_id', 'article_id'}}.
+
+    An article is new when its (author_id, article_id) is not in the index, except that
+    articles of new authors, articles with article_id 0 and articles older than time_threshold are skipped.
 
-                # If the author id is new, skip this article,
-                # and effectively avoid misjudgment when the last acquisition fails or the next acquisition fails
-                if current_article['author_id'] not in previous_authors_ids:
+    :return [Article, Article]
+    """
+    new_articles = []
+
+    # Loop through each article in the current article list
+    for current_article_list in current_articles_lists:
+        for current_article in current_article_list:
+
+            # If the article_id acquisition fails, record an error and skip
+            if current_article.article_id is None:
+                logging.error(f"article_id is null {current_article}")
+                continue
+
+            # If the author id is new, skip this article,
+            # and effectively avoid misjudgment when the last acquisition fails or the next acquisition fails
+            previous_article_ids = previous_articles_index.get(current_article.author_id)
+            if previous_article_ids is None:
+                continue
+
+            # If some APIs do not return,
+            # current_article.article_id will be recorded as 0, skipped to avoid misjudgment
+            if current_article.article_id.isdigit():
+                if int(current_article.article_id) == 0:
                     continue
 
-                # If some APIs do not return,
-                # current_article['article_id'] will be recorded as 0, skipped to avoid misjudgment
-                if current_article['article_id'].isdigit():
-                    if int(current_article['article_id']) == 0:
+            # Skip when the difference between creation_time and snapshot_time exceeds the value of time_threshold
+            # and skip time diff judgment for articles with creation_time == 0, further avoid misjudgment
+            if current_article.creation_time is not None and current_article.creation_time.isdigit():
+                if int(current_article.creation_time) != 0:
+                    time_diff = int(current_article.snapshot_time) - int(current_article.creation_time)
+                    if time_diff > time_threshold:
                         continue
 
-                # Skip when the difference between creation_time and snapshot_time exceeds the value of time_threshold
-                # and skip time diff judgment for articles with creation_time == 0, further avoid misjudgment
-                if current_article['creation_time'] is not None and current_article['creation_time'].isdigit():
-                    if int(current_article['creation_time']) != 0:
-                        time_diff = int(current_article['snapshot_time']) - int(current_article['creation_time'])
-                        if time_diff > time_threshold:
-                            is_new = False
-
-                # Use the article_id and author_id field of the article as a unique identifier,
-                # to find whether it exists in the last obtained article list
-                for previous_articles_lists_list in previous_articles_lists:
-                    for previous_article in previous_articles_lists_list:
-                        if current_article['article_id'] == previous_article['article_id'] and current_article[
-                            'author_id'] == previous_article['author_id']:
-                            is_new = False
-                            break
-                    if not is_new:
-                        break
-
-                # If the current article does not exist in the last obtained article list,
-                # add it to the new article list
-                if is_new:
-                    new_articles.append(current_article)
-
-        # Save the current article list to the previous_articles_file_path file for comparison at the next execution
-        with open(previous_articles_file_path, 'w', encoding='utf-8') as f:
-            json.dump(current_articles_lists, f, ensure_ascii=False)
-
-    except FileNotFoundError as error:
-        new_articles = []
-        logging.exception(f'File not found: {error}')
+            # Use the article_id and author_id field of the article as a unique identifier,
+            # if the current article does not exist in the last obtained article list,
+            # add it to the new article list
+            if current_article.article_id not in previous_article_ids:
+                new_articles.append(current_article)
+
+    metrics.inc('articlescraperbot_articles_total', len(new_articles), kind='new')
+    return new_articles
+
+
+def get_new_articles(all_current_articles_lists, snapshot_store=None, time_threshold=86400):
+    """
+    Get new articles from the given list of articles and merge the current articles into the snapshot store.
+
+    time_threshold = days * 24 * 60 * 60
+    15 days = 1296000
+    3 days = 259200
+    1 day = 86400
+
+    :param all_current_articles_lists: [[Article]] or the JSON string of it
+    :param snapshot_store: SnapshotStore, open_snapshot_store() if None
+    :return [Article, Article]
+    """
+    store = snapshot_store if snapshot_store is not None else open_snapshot_store()
+
+    try:
+        current_articles_lists = load_articles_lists(all_current_articles_lists)
+
+        # Only the shards of the authors in this run are read
+        previous_articles_index = store.load_index(
+            article.author_id for article_list in current_articles_lists for article in article_list)
+        new_articles = find_new_articles(current_articles_lists, previous_articles_index, time_threshold)
+
+        # Save the current articles for comparison at the next execution, only the changed shards are written
+        store.update(current_articles_lists)
+
     except Exception as error:
         new_articles = []
         logging.exception(f'Unexpected error in get_new_articles(): {error}')
-        logging.error(f'Current article: {current_article}')
+    finally:
+        if snapshot_store is None:
+            store.close()
 
     return new_articles
 
 
-def get_articles_summary(all_current_articles_lists, start_time_threshold=86400, end_time=None):
+def get_articles_summary(all_current_articles_lists, start_time_threshold=86400, end_time=None, aggregator=None,
+                         archive=None):
     """
     The time interception range is "end_time - start_time_threshold" to "end_time",
     For example, if
@@ -190,72 +356,69 @@ def get_articles_summary(all_current_articles_lists, start_time_threshold=86400,
     we will take "foo" as "team_name" or "channel_name",
     if "team_name" or "channel_name" without "-" then extract all
 
+    With aggregator (a SummaryAggregator), the counts come from its stored hourly counters,
+    which include every article seen in earlier runs, not only the articles in all_current_articles_lists.
+    With archive (an ArticleArchive), the counts come from the archived articles, over any range of time,
+    e.g. get_articles_summary([], start_time_threshold=30 * 86400, end_time=end_time, archive=archive).
+
     :return {'team_name' : {'channel_name': num,'channel_name': 'num',total: 'num'},'team_name' : {'channel_name': num,'channel_name': 'num',total: 'num'}}
     type dic
     """
-    # Convert a JSON string to a Python list
-    current_articles_lists = json.loads(all_current_articles_lists)
+    current_articles_lists = load_articles_lists(all_current_articles_lists)
 
     channel_article_count = {}
 
     # The default end_time is snapshot_time which is close to the current time
     if end_time is None:
         try:
-            end_time = int(current_articles_lists[0][0]['snapshot_time'])
+            end_time = int(current_articles_lists[0][0].snapshot_time)
         except Exception as error:
             logging.exception(f'Cannot get end_time: {error}')
             logging.error(f'trying to set end_time to current time')
             end_time = int(datetime.now().timestamp())
 
+    try:
+        start_time = end_time - int(start_time_threshold)
+    except Exception as error:
+        logging.exception(f'Cannot get start_time: {error}')
+
+    if archive is not None:
         try:
-            start_time = end_time - int(start_time_threshold)
+            return archive.summary(start_time, end_time)
         except Exception as error:
-            logging.exception(f'Cannot get start_time: {error}')
+            logging.exception(f'Cannot get summary from archive, counting the current articles: {error}')
+
+    if aggregator is not None:
+        try:
+            return aggregator.summary(start_time, end_time)
+        except Exception as error:
+            logging.exception(f'Cannot get summary from aggregator, counting the current articles: {error}')
 
     try:
         for current_article_list in current_articles_lists:
             for current_article in current_article_list:
 
                 # Check if the article is within start_time to end_time
-                if start_time <= int(current_article['creation_time']) <= end_time:
-                    pass
-                else:
+                if not start_time <= int(current_article.creation_time) <= end_time:
                     continue
 
                 try:
-                    # Get channel_name,
-                    # "channel_name" can be further subdivided by the new-style named "foo-bar"
-                    # we will take foo as channel_name, if "author_name" without "-" then extract all
-                    channel_name_raw = current_article['channel_name']
-                    channel_name = channel_name_raw.split('-')[0]
-
-                    # Get team_name,
-                    # "author_name" can be further subdivided by the new-style named "foo-bar"
-                    # we will take foo as team_name, if "author_name" without "-" then extract all
-                    team_name_raw = current_article['author_name']
-                    team_name = team_name_raw.split('-')[0]
-
+                    # Get team_name and channel_name, split once per author
+                    team_name, channel_name = split_team_and_channel(current_article.author_name,
+                                                                     current_article.channel_name)
                 except Exception as error:
                     logging.exception(f'Cannot get team_name or channel_name: {error}')
+                    continue
 
                 # Whether team_name already exists in channel_article_count,
                 # if it exists, add one to the count,
                 # if not, increase the team_name key-value pair and set the value to 1
-                if team_name in channel_article_count:
-                    # same but channel_name
-                    if channel_name in channel_article_count[team_name]:
-                        channel_article_count[team_name][channel_name] += 1
-                    else:
-                        channel_article_count[team_name][channel_name] = 1
-                else:
-                    channel_article_count[team_name] = {channel_name: 1}
+                team_count = channel_article_count.setdefault(team_name, {})
+                team_count[channel_name] = team_count.get(channel_name, 0) + 1
 
-                # Calculate total count and add to channel_article_count
+        # Calculate total count and add to channel_article_count
         for team_name, channel_info in channel_article_count.items():
-            total_count = 0
-            for channel_name, count in channel_info.items():
-                total_count += count
-            channel_article_count[team_name]['total'] = total_count
+            channel_info['total'] = sum(channel_info.values())
 
         # add time
         channel_article_count['time'] = {'start_time': start_time, 'end_time': end_time}
@@ -282,70 +445,124 @@ def time_judgment(target_time_hour: int, time_range: timedelta, current_time: da
     return start_time <= current_time <= end_time
 
 
+def open_pushed_records(records_expire_days=7, records_name='article_pushed_records.sqlite3'):
+    """
+    Open the PushedRecords next to this file, importing the old pickle push log once if it exists.
+    """
+    records_dir = os.path.dirname(os.path.abspath(__file__))
+    records = PushedRecords(os.path.join(records_dir, '.', records_name), records_expire_days)
+
+    legacy_records_path = os.path.join(records_dir, '.', 'article_pushed_records.pkl')
+    if os.path.exists(legacy_records_path):
+        records.import_pickle_records(legacy_records_path)
+
+    return records
+
+
+def open_snapshot_store(snapshot_name='previous_articles.sqlite3'):
+    """
+    Open the snapshot of the previous articles, previous_articles.json of older versions is imported once.
+    """
+    snapshot_dir = os.path.dirname(os.path.abspath(__file__))
+    snapshot_store = SnapshotStore(os.path.join(snapshot_dir, '.', snapshot_name))
+
+    legacy_snapshot_path = os.path.join(snapshot_dir, '.', 'previous_articles.json')
+    if os.path.exists(legacy_snapshot_path):
+        snapshot_store.import_json_snapshot(legacy_snapshot_path)
+
+    return snapshot_store
+
+
+def open_worker_coordinator(worker_id, heartbeat_ttl, coordination_name='workers.sqlite3'):
+    coordination_dir = os.path.dirname(os.path.abspath(__file__))
+    return WorkerCoordinator(os.path.join(coordination_dir, '.', coordination_name), worker_id, heartbeat_ttl)
+
+
+def open_summary_aggregator(counters_name='summary_counters.sqlite3'):
+    counters_dir = os.path.dirname(os.path.abspath(__file__))
+    return SummaryAggregator(os.path.join(counters_dir, '.', counters_name))
+
+
+def open_duplicate_index(records_expire_days=7, index_name='duplicate_index.sqlite3'):
+    index_dir = os.path.dirname(os.path.abspath(__file__))
+    return DuplicateIndex(os.path.join(index_dir, '.', index_name), records_expire_days)
+
+
+def open_article_archive(archive_name='article_archive.sqlite3'):
+    """
+    The archive is optional, a run goes on without it, e.g. when SQLite is built without FTS5 or trigram
+
+    :return: ArticleArchive, or None if it cannot be opened
+    """
+    archive_dir = os.path.dirname(os.path.abspath(__file__))
+    try:
+        return ArticleArchive(os.path.join(archive_dir, '.', archive_name))
+    except Exception as error:
+        logging.exception(f'Cannot open the article archive, articles are not archived: {error}')
+        return None
+
+
+def open_outbox(outbox_name='outbox.sqlite3'):
+    outbox_dir = os.path.dirname(os.path.abspath(__file__))
+    return Outbox(os.path.join(outbox_dir, '.', outbox_name))
+
+
 def push_new_articles(new_articles, push_func, current_time, records_expire_days=7,
-                      records_name='article_pushed_records.pkl'):
+                      records_name='article_pushed_records.sqlite3', records=None, outbox=None, sink_names=None,
+                      duplicate_index=None):
     """
     Check whether duplicate articles have been pushed within 7 days, and push
 
     :param new_articles: new_articles
-    :param push_func: push function name
+    :param push_func: push function name, not used when outbox is given
+    :param records: an open PushedRecords, if None, open records_name next to this file for this call
+    :param outbox: an open Outbox, if given the articles are only queued for sink_names,
+                   they are sent later by Outbox.deliver()
+    :param duplicate_index: an open DuplicateIndex, if given the copies of one item cross-posted to several
+                            channels or authors are pushed as one article, a later copy is merged into the
+                            queued article, or dropped if it was already pushed
     """
-    records_dir = os.path.dirname(os.path.abspath(__file__))
-    records_path = os.path.join(records_dir, '.', records_name)
+    close_records = records is None
+    if records is None:
+        records = open_pushed_records(records_expire_days, records_name)
 
-    def load_records(records_path):
-        try:
-            with open(records_path, 'rb') as f:
-                records = pickle.load(f)
-        except FileNotFoundError:
-            records = []
-        return records
-
-    def check_if_article_is_pushed(article, records, current_time):
-        for record in records:
-            if record['article'] == article and current_time - record['push_time'] < timedelta(
-                    days=records_expire_days):
-                # Already pushed
-                return True
-        # Not pushed
-        return False
-
-    def record_pushed_article(article, records, current_time):
-        records.append({
-            'article': article,
-            'push_time': current_time
-        })
-
-    def save_records(records):
-        with open(records_path, 'wb') as f:
-            pickle.dump(records, f)
-
-    def clean_expired_records_and_save(records, current_time):
-        # Calculate the difference between the current time and the push time in the record.
-        # If this time difference is less than or equal to records_expire_days days,
-        # it means that this record has not expired, and it will be added to the new list.
-        new_records = [record for record in records if
-                       current_time - record['push_time'] <= timedelta(days=records_expire_days)]
-        save_records(new_records)
-
-    records = load_records(records_path)
-
-    # Determine whether the article has been pushed
-    unpushed_articles = []
-    for article in new_articles:
-        if not check_if_article_is_pushed(article, records, current_time):
-            unpushed_articles.append(article)
-
-    # Push if there are unpushed articles
-    if unpushed_articles:
-        push_func(unpushed_articles)
-
-        # Add pushed articles to the pushed list
-        for article in unpushed_articles:
-            record_pushed_article(article, records, current_time)
-
-    # clean expired records and save new records
-    clean_expired_records_and_save(records, current_time)
+    try:
+        # Determine whether the article has been pushed
+        unpushed_articles = [article for article in new_articles if not records.is_pushed(article, current_time)]
+        metrics.inc('articlescraperbot_articles_total', len(new_articles) - len(unpushed_articles),
+                    kind='deduplicated')
+
+        # Push (or queue) if there are unpushed articles
+        if unpushed_articles:
+            articles_to_push = unpushed_articles
+            if duplicate_index is not None:
+                groups, copies = duplicate_index.collapse(unpushed_articles, current_time)
+                articles_to_push = [merge_group(group) for group in groups]
+                metrics.inc('articlescraperbot_articles_total',
+                            len(unpushed_articles) - len(articles_to_push), kind='near_duplicate')
+                # A copy of an article still in the outbox is merged into it, a copy of a sent one is dropped
+                merged = outbox.add_copies(copies) if outbox is not None and copies else 0
+                if len(articles_to_push) < len(unpushed_articles):
+                    logging.info(f'Collapsed {len(unpushed_articles)} articles into {len(articles_to_push)}, '
+                                 f'{merged} copies merged into queued articles, '
+                                 f'{len(copies) - merged} copies of pushed articles dropped')
+
+            if articles_to_push:
+                if outbox is not None:
+                    outbox.enqueue(articles_to_push, sink_names)
+                else:
+                    push_func(articles_to_push)
+
+            # Add pushed articles to the pushed records
+            records.record(unpushed_articles, current_time)
+
+        # clean expired records
+        records.clean_expired(current_time)
+        if duplicate_index is not None:
+            duplicate_index.clean_expired(current_time)
+    finally:
+        if close_records:
+            records.close()
 
 
 def setup_logging(log_name='spider.log', max_bytes=10485760, backup_count=3):
@@ -362,33 +579,258 @@ def setup_logging(log_name='spider.log', max_bytes=10485760, backup_count=3):
                         level=logging.INFO, format=log_format, datefmt=data_format,
                         encoding='utf-8')
 
+@contextlib.contextmanager
+def stage(name):
+    """
+    Time one pipeline stage in the metrics, and profile it when --profile is given.
+    """
+    with metrics.timer('articlescraperbot_stage_duration_seconds', stage=name), profiler.section(f'stage {name}'):
+        yield
+
+
+def run_once(current_time, metrics_dir=None, worker_id=None, heartbeat_ttl=3600):
+    """
+    Crawl all spiders once, push new articles and push the summary if it is around 20 o'clock.
+    This is what a cron run does.
+
+    :param metrics_dir: if set, write the metrics of this run there for the node-exporter textfile collector
+    :param worker_id: if set, only crawl the authors of this worker, see WorkerCoordinator,
+                      heartbeat_ttl must be longer than the interval between two runs
+    """
+    coordinator = None
+    if worker_id:
+        coordinator = open_worker_coordinator(worker_id, heartbeat_ttl)
+        # The workers started by the same cron entry register within a few seconds of each other
+        coordinator.join(settle_seconds=10)
+
+    # get current_articles_lists
+    with stage('spiders_init'):
+        objects_list = spiders_init(load_spiders_list())
+        if coordinator:
+            for object_ in objects_list:
+                object_.author_filter = coordinator.owns
+    with stage('get_all_current_articles_lists'):
+        all_current_articles_lists = get_all_current_articles_lists(objects_list)
+
+    # get new_articles
+    with stage('get_new_articles'):
+        new_articles = get_new_articles(all_current_articles_lists)
+
+    # count the articles for the summary
+    aggregator = open_summary_aggregator()
+    try:
+        with stage('summary_aggregator'):
+            aggregator.add(all_current_articles_lists)
+            aggregator.prune()
+    except Exception as error:
+        logging.exception(f'Summary aggregator error: {error}')
+
+    # queue new articles for every sink of the notifiers
+    logging.info(f'new articles: {new_articles}')
+    notifiers = notifiers_init(load_notifier_list())
+    sinks = get_sinks(notifiers)
+    outbox = open_outbox()
+    duplicate_index = open_duplicate_index()
+    try:
+        with stage('push_new_articles'):
+            push_new_articles(new_articles=new_articles, push_func=None, current_time=current_time,
+                              outbox=outbox, sink_names=list(sinks), duplicate_index=duplicate_index)
+
+        # If the current time is around 20 o'clock for 15 minutes, only the leader pushes it when sharded
+        if (coordinator is None or coordinator.is_leader()) and \
+                time_judgment(target_time_hour=20, time_range=timedelta(minutes=15), current_time=current_time):
+            with stage('summary'):
+                # get articles_summary
+                articles_summary = get_articles_summary(all_current_articles_lists, aggregator=aggregator)
+                # push summary to dingtalk
+                logging.info(f'articles summary: {articles_summary}')
+                push_summary(notifiers, articles_summary)
+
+        # send the queued articles, including the ones that failed in earlier runs,
+        # only the leader delivers when sharded, the rate limit of each webhook is kept by one process
+        if coordinator is None or coordinator.is_leader():
+            with stage('deliver'):
+                outbox.deliver(sinks)
+
+        # keep every article of this run in the archive, in one transaction
+        archive = open_article_archive()
+        if archive is not None:
+            try:
+                with stage('archive'):
+                    archive.add(all_current_articles_lists)
+            except Exception as error:
+                logging.exception(f'Article archive error: {error}')
+            finally:
+                archive.close()
+    finally:
+        outbox.close()
+        duplicate_index.close()
+        aggregator.close()
+        browser_pool.close()
+        if coordinator:
+            coordinator.close()
+        if metrics_dir:
+            metrics.write_textfile(metrics_dir)
+
+
+def run_daemon(spiders_list, default_interval=1800, summary_hour=20, max_workers=4, deliver_interval=15,
+               time_threshold=86400, metrics_dir=None, worker_id=None, heartbeat_ttl=120):
+    """
+    Keep the spiders, the snapshot and the pushed records open and crawl on an in-process schedule
+    instead of being re-launched by cron.
+
+    Each spider is crawled every "interval" seconds from spider_list.json (default_interval if not set),
+    the summary is pushed every day at summary_hour o'clock,
+    SIGTERM or SIGINT stops the daemon after the running jobs finish.
+    If metrics_dir is set, the metrics are written there every minute.
+    If worker_id is set, only the authors of this worker are crawled and the authors are rebalanced
+    when workers join or leave, see WorkerCoordinator.
+    """
+    objects_list = spiders_init(spiders_list) or []
+    coordinator = None
+    if worker_id:
+        coordinator = open_worker_coordinator(worker_id, heartbeat_ttl)
+        # The other daemons see this worker at their next heartbeat
+        coordinator.join(settle_seconds=max(1, heartbeat_ttl // 3))
+        for object_ in objects_list:
+            object_.author_filter = coordinator.owns
+    records = open_pushed_records()
+    outbox = open_outbox()
+    duplicate_index = open_duplicate_index()
+    notifiers = notifiers_init(load_notifier_list())
+    sinks = get_sinks(notifiers)
+    aggregator = open_summary_aggregator()
+    snapshot_store = open_snapshot_store()
+    archive = open_article_archive()
+
+    # id(object_) -> [[Article]] of its last successful crawl
+    current_articles_lists_by_spider = {}
+    lock = threading.Lock()
+
+    def get_all_articles_lists():
+        with lock:
+            return [article_list for articles_lists in current_articles_lists_by_spider.values()
+                    for article_list in articles_lists]
+
+    def crawl(object_):
+        # The same stages as run_once(), each crawl of each spider adds a run to them
+        with stage('get_all_current_articles_lists'):
+            current_articles_lists = get_all_current_articles_lists([object_], max_workers=1)
+        current_time = datetime.now()
+
+        # The shards of a failed spider are carried forward by the snapshot store
+        if not current_articles_lists:
+            logging.warning(f'{object_} returned nothing, keep its previous articles')
+            return
+
+        with stage('get_new_articles'):
+            new_articles = get_new_articles(current_articles_lists, snapshot_store, time_threshold)
+        with lock:
+            current_articles_lists_by_spider[id(object_)] = current_articles_lists
+        with stage('summary_aggregator'):
+            aggregator.add(current_articles_lists)
+
+        logging.info(f'new articles: {new_articles}')
+        with stage('push_new_articles'):
+            push_new_articles(new_articles=new_articles, push_func=None, current_time=current_time,
+                              records=records, outbox=outbox, sink_names=list(sinks), duplicate_index=duplicate_index)
+        if archive is not None:
+            with stage('archive'):
+                archive.add(current_articles_lists)
+
+    def summary():
+        if coordinator and not coordinator.is_leader():
+            return
+        with stage('summary'):
+            aggregator.prune()
+            articles_summary = get_articles_summary(get_all_articles_lists(), end_time=int(time.time()),
+                                                    aggregator=aggregator)
+            logging.info(f'articles summary: {articles_summary}')
+            push_summary(notifiers, articles_summary)
+
+    def deliver():
+        # Only the leader delivers, the rate limit of each webhook is kept by one process
+        if coordinator and not coordinator.is_leader():
+            return
+        # Each sink is sent in its own thread, a sink still sending from the last run is skipped,
+        # so a webhook that never answers only holds up itself
+        with stage('deliver'):
+            outbox.deliver(sinks, timeout=None, wait=False)
+
+    scheduler = Scheduler(max_workers=max_workers)
+    for object_ in objects_list:
+        scheduler.every(f'crawl {object_}', functools.partial(crawl, object_),
+                        getattr(object_, 'interval', None) or default_interval)
+    scheduler.daily_at('summary', summary, hour=summary_hour)
+    # The delivery worker, a slow or failing robot never holds up the crawl jobs
+    scheduler.every('deliver', deliver, deliver_interval)
+    if metrics_dir:
+        scheduler.every('metrics', functools.partial(metrics.write_textfile, metrics_dir), 60)
+    if coordinator:
+        scheduler.every('heartbeat', coordinator.heartbeat, max(1, heartbeat_ttl // 3))
+
+    def stop(signum, frame):
+        logging.info(f'Received signal {signum}, stopping')
+        scheduler.stop()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    try:
+        scheduler.run()
+    finally:
+        records.close()
+        # Let the sinks finish the message being sent, their acknowledgements need the outbox
+        outbox.join_deliveries(timeout=30)
+        outbox.close()
+        duplicate_index.close()
+        aggregator.close()
+        snapshot_store.close()
+        if archive is not None:
+            archive.close()
+        browser_pool.close()
+        if coordinator:
+            coordinator.leave()
+            coordinator.close()
+        if metrics_dir:
+            metrics.write_textfile(metrics_dir)
+
+
 if __name__ == "__main__":
     # Important
     # run this to make it run on absolute paths
     site.addsitedir(realpath(join(dirname(__file__), '..')))
     site.addsitedir(realpath(dirname(__file__)))
 
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--daemon', action='store_true',
+                        help='keep running and crawl on the intervals in spider_list.json instead of once')
+    parser.add_argument('--metrics-dir',
+                        help='write metrics in the Prometheus text format to this node-exporter textfile directory')
+    parser.add_argument('--worker-id',
+                        help='run as one of several workers sharing the program directory, '
+                             'each worker crawls its share of the authors')
+    parser.add_argument('--heartbeat-ttl', type=int,
+                        help='seconds after which a silent worker is dropped, '
+                             'default 120 with --daemon, otherwise 3600 (longer than the cron interval)')
+    parser.add_argument('--profile', nargs='?', const=join(dirname(realpath(__file__)), 'profile'),
+                        help='write CPU and memory reports of each spider and stage to this directory '
+                             '(default ./profile) when the run ends')
+    args = parser.parse_args()
+
     # log
     setup_logging()
 
-    # Define the current time here to avoid incorrect time due to long processing time
-    current_time = datetime.now()
-
-    # get current_articles_lists
-    objects_list = spiders_init(load_spiders_list())
-    all_current_articles_lists = get_all_current_articles_lists(objects_list)
-
-    # get new_articles
-    new_articles = get_new_articles(all_current_articles_lists)
+    if args.profile:
+        profiler.start(args.profile)
 
-    # push new articles to dingtalk
-    logging.info(f'new articles: {new_articles}')
-    push_new_articles(new_articles=new_articles, push_func=push_new_articles_to_dingtalk, current_time=current_time)
-
-    # If the current time is around 20 o'clock for 15 minutes
-    if time_judgment(target_time_hour=20, time_range=timedelta(minutes=15), current_time=current_time):
-        # get articles_summary
-        articles_summary = get_articles_summary(all_current_articles_lists)
-        # push summary to dingtalk
-        logging.info(f'articles summary: {articles_summary}')
-        push_summary_to_dingtalk(articles_summary)
+    try:
+        if args.daemon:
+            run_daemon(load_spiders_list(), metrics_dir=args.metrics_dir, worker_id=args.worker_id,
+                       heartbeat_ttl=args.heartbeat_ttl or 120)
+        else:
+            # Define the current time here to avoid incorrect time due to long processing time
+            run_once(current_time=datetime.now(), metrics_dir=args.metrics_dir, worker_id=args.worker_id,
+                     heartbeat_ttl=args.heartbeat_ttl or 3600)
+    finally:
+        profiler.stop()
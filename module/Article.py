@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Function: in-memory article record shared by spiders, main program and robots
+# Author: 10935336
+# Creation date: 2026-10-18
+# Modified date: 2026-10-18
+
+import json
+from dataclasses import dataclass, fields
+
+
+@dataclass(slots=True)
+class Article:
+    """
+    One article, all fields are str, creation_time and snapshot_time are int timestamps as str.
+
+    Supports article['field'] so that code written for the old dict articles keeps working.
+    """
+    title: str
+    article_id: str
+    author_name: str
+    author_id: str
+    channel_name: str
+    link: str
+    creation_time: str
+    snapshot_time: str
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in ARTICLE_FIELDS}
+
+    @classmethod
+    def from_dict(cls, article_dict):
+        return cls(*(article_dict.get(name) for name in ARTICLE_FIELDS))
+
+
+ARTICLE_FIELDS = tuple(field.name for field in fields(Article))
+
+
+def articles_to_json(articles):
+    """
+    :param articles: [Article, Article]
+    :return: JSON string in the format described in README
+    """
+    return json.dumps([article.to_dict() for article in articles], ensure_ascii=False)
+
+
+def articles_from_json(articles_json):
+    """
+    :param articles_json: JSON string in the format described in README
+    :return: [Article, Article]
+    """
+    return [Article.from_dict(article_dict) for article_dict in json.loads(articles_json)]
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Function: append-only archive of every article seen, with full-text and time range queries
+# Author: 10935336
+# Creation date: 2026-10-18
+# Modified date: 2026-10-18
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from module.Article import ARTICLE_FIELDS, Article
+from module.PushedRecords import PushedRecords
+from module.SummaryAggregator import split_team_and_channel
+
+
+class ArticleArchive:
+    """
+    Every article seen by a run, kept forever in SQLite, so the history can be queried without re-crawling.
+
+    The articles are indexed on author_id, channel_name, team_name and creation_time,
+    the titles and author names in an FTS5 table with the trigram tokenizer, which also matches Chinese
+    and Japanese text. An article is only written once, keyed on the same fingerprint as PushedRecords.
+    """
+
+    def __init__(self, archive_path):
+        self.archive_path = archive_path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(archive_path, timeout=30, check_same_thread=False)
+        try:
+            self.create_tables()
+        except sqlite3.Error:
+            # e.g. "no such tokenizer: trigram" on SQLite older than 3.34 or built without FTS5
+            self.connection.close()
+            raise
+
+    def create_tables(self):
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS articles ('
+                                    'id INTEGER PRIMARY KEY, fingerprint BLOB NOT NULL UNIQUE, '
+                                    'title TEXT, article_id TEXT, author_name TEXT, author_id TEXT, '
+                                    'channel_name TEXT, link TEXT, creation_time INTEGER, snapshot_time INTEGER, '
+                                    'team_name TEXT)')
+            for column in ('author_id', 'channel_name', 'creation_time'):
+                self.connection.execute(f'CREATE INDEX IF NOT EXISTS articles_{column} ON articles ({column})')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS articles_team_name '
+                                    'ON articles (team_name, creation_time)')
+            self.connection.execute('CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5('
+                                    'title, author_name, content=articles, content_rowid=id, tokenize=trigram)')
+            self.connection.execute('CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN '
+                                    'INSERT INTO articles_fts (rowid, title, author_name) '
+                                    'VALUES (new.id, new.title, new.author_name); END')
+
+    @staticmethod
+    def to_int(timestamp):
+        try:
+            return int(timestamp)
+        except (TypeError, ValueError):
+            return None
+
+    def add(self, articles_lists):
+        """
+        Write the articles not archived yet, in one transaction.
+
+        :param articles_lists: [[Article]] or [[{}]]
+        :return: int number of articles written
+        """
+        rows = []
+        for article_list in articles_lists:
+            for article in article_list:
+                team_name, _ = split_team_and_channel(article['author_name'], article['channel_name'])
+                rows.append((PushedRecords.fingerprint(article), article['title'], article['article_id'],
+                             article['author_name'], article['author_id'], article['channel_name'], article['link'],
+                             self.to_int(article['creation_time']), self.to_int(article['snapshot_time']),
+                             team_name))
+
+        with self.lock, self.connection:
+            # Nothing is ever deleted, so the new rows are the ids above the largest one
+            before = self.connection.execute('SELECT IFNULL(MAX(id), 0) FROM articles').fetchone()[0]
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO articles (fingerprint, title, article_id, author_name, author_id, '
+                'channel_name, link, creation_time, snapshot_time, team_name) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                rows)
+            return self.connection.execute('SELECT IFNULL(MAX(id), 0) FROM articles').fetchone()[0] - before
+
+    def search(self, text=None, team_name=None, author_id=None, channel_name=None, start_time=None, end_time=None,
+               limit=50):
+        """
+        :param text: words of the title or author name, any order
+        :return: [Article] newest first
+        """
+        conditions = []
+        params = []
+        if text:
+            words = str(text).split()
+            if all(len(word) >= 3 for word in words):
+                # One quoted string per word, so the user input is never parsed as FTS5 syntax
+                conditions.append('id IN (SELECT rowid FROM articles_fts WHERE articles_fts MATCH ?)')
+                params.append(' '.join('"' + word.replace('"', '""') + '"' for word in words))
+            else:
+                # The trigram index does not match words shorter than 3 characters
+                for word in words:
+                    conditions.append('(title LIKE ? OR author_name LIKE ?)')
+                    params.extend([f'%{word}%'] * 2)
+        for column, value in (('team_name', team_name), ('author_id', author_id), ('channel_name', channel_name)):
+            if value is not None:
+                conditions.append(f'{column} = ?')
+                params.append(value)
+        if start_time is not None:
+            conditions.append('creation_time >= ?')
+            params.append(int(start_time))
+        if end_time is not None:
+            conditions.append('creation_time <= ?')
+            params.append(int(end_time))
+
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        with self.lock:
+            rows = self.connection.execute(
+                f'SELECT {", ".join(ARTICLE_FIELDS)} FROM articles {where} ORDER BY creation_time DESC LIMIT ?',
+                [*params, limit]).fetchall()
+        return [Article(*(None if value is None else str(value) for value in row)) for row in rows]
+
+    def summary(self, start_time, end_time):
+        """
+        :return {'team_name' : {'channel_name': num,'channel_name': 'num',total: 'num'}, 'time': {'start_time': start_time, 'end_time': end_time}}
+        same as get_articles_summary() in main.py, over any range of creation_time
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT author_name, channel_name, COUNT(*) FROM articles '
+                'WHERE creation_time >= ? AND creation_time <= ? GROUP BY author_name, channel_name',
+                (int(start_time), int(end_time))).fetchall()
+
+        channel_article_count = {}
+        for author_name, channel_name, count in rows:
+            team_name, channel_name = split_team_and_channel(author_name, channel_name)
+            team_count = channel_article_count.setdefault(team_name, {})
+            team_count[channel_name] = team_count.get(channel_name, 0) + count
+        for team_name, channel_info in channel_article_count.items():
+            channel_info['total'] = sum(channel_info.values())
+
+        channel_article_count['time'] = {'start_time': int(start_time), 'end_time': int(end_time)}
+        return channel_article_count
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def parse_date(value):
+    """
+    :param value: "2026-10-18" or "2026-10-18 20:00"
+    :return: int timestamp
+    """
+    for date_format in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return int(datetime.strptime(value, date_format).timestamp())
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f'invalid date: {value}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m module.ArticleArchive',
+                                     description='Query the archive of the articles seen by main.py')
+    parser.add_argument('text', nargs='?', help='words of the title or author name')
+    parser.add_argument('--team', help='team_name, the part of author_name before "-"')
+    parser.add_argument('--author-id')
+    parser.add_argument('--channel', help='channel_name')
+    parser.add_argument('--since', type=parse_date, help='creation time from, e.g. 2026-09-01')
+    parser.add_argument('--until', type=parse_date, help='creation time to, default now')
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--summary', action='store_true',
+                        help='print the per team and channel counts of --since to --until instead of the articles')
+    parser.add_argument('--archive', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                                                          'article_archive.sqlite3'))
+    args = parser.parse_args(argv)
+
+    archive = ArticleArchive(args.archive)
+    try:
+        if args.summary:
+            end_time = args.until or int(datetime.now().timestamp())
+            start_time = args.since if args.since is not None else end_time - 86400
+            print(json.dumps(archive.summary(start_time, end_time), ensure_ascii=False, indent=2))
+            return
+
+        for article in archive.search(args.text, args.team, args.author_id, args.channel, args.since, args.until,
+                                      args.limit):
+            creation_time = datetime.fromtimestamp(int(article.creation_time)).strftime('%Y-%m-%d %H:%M') \
+                if article.creation_time else '?'
+            print(f'{creation_time}  [{article.channel_name}] {article.author_name}: {article.title}  {article.link}')
+    finally:
+        archive.close()
+
+
+if __name__ == '__main__':
+    main()
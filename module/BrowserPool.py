@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Function: shared pool of headless browsers leased by Selenium based spiders
+# Author: 10935336
+# Creation date: 2026-10-18
+# Modified date: 2026-10-18
+
+import contextlib
+import logging
+import os
+import threading
+import time
+
+from module.Metrics import metrics
+
+
+def firefox_factory():
+    """
+    The default driver factory, a headless Firefox. selenium is only imported when the first browser is started.
+    """
+    from selenium import webdriver
+    from selenium.webdriver.firefox.options import Options
+
+    options = Options()
+    options.add_argument('-headless')
+    return webdriver.Firefox(options=options)
+
+
+def process_tree_rss(pid):
+    """
+    :return: int resident memory in bytes of pid and all its descendants, read from /proc, None if unavailable
+    """
+    try:
+        children = {}
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat', 'r') as r:
+                    # The command name may contain spaces, the fields after it are fixed
+                    ppid = int(r.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+
+        page_size = os.sysconf('SC_PAGE_SIZE')
+        rss = 0
+        pids = [pid]
+        while pids:
+            current_pid = pids.pop()
+            try:
+                with open(f'/proc/{current_pid}/statm', 'r') as r:
+                    rss += int(r.read().split()[1]) * page_size
+            except (OSError, IndexError, ValueError):
+                continue
+            pids.extend(children.get(current_pid, []))
+        return rss
+    except Exception as error:
+        logging.debug(f'Cannot read the memory usage of process {pid}: {error}')
+        return None
+
+
+def driver_rss(driver):
+    """
+    :return: int resident memory in bytes of the driver service (geckodriver) and the browser it started,
+             None if unknown
+    """
+    try:
+        return process_tree_rss(driver.service.process.pid)
+    except AttributeError:
+        return None
+
+
+class PooledBrowser:
+    """
+    One leased browser, counts the pages loaded through it so the pool can recycle it.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.created_time = time.time()
+
+    def get(self, url):
+        self.pages += 1
+        return self.driver.get(url)
+
+
+class BrowserPool:
+    """
+    At most max_size browsers shared by all spiders of the process, started on demand and kept warm between leases,
+    so a daemon reuses the same sessions on every crawl.
+
+    A browser is quit instead of returned to the pool after max_pages pages, when its lease raised,
+    or when the browsers of the pool use more than max_rss_mb together, no new browser is started above that.
+
+    :param driver_factory: function returning a new driver, replace it to use another browser or a fake driver
+    :param rss_func: function returning the memory in bytes used by a driver, or None if unknown
+    """
+
+    def __init__(self, driver_factory=firefox_factory, max_size=2, max_rss_mb=1536, max_pages=50, rss_func=driver_rss):
+        self.driver_factory = driver_factory
+        self.max_size = max_size
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.max_pages = max_pages
+        self.rss_func = rss_func
+        self.condition = threading.Condition()
+        # every browser started and not yet quit, leased or idle
+        self.browsers = []
+        self.idle = []
+        # browsers being started, counted in the size
+        self.starting = 0
+        self.closed = False
+
+    def total_rss(self, browsers):
+        total = 0
+        for browser in browsers:
+            rss = self.rss_func(browser.driver)
+            if rss:
+                total += rss
+        return total
+
+    def acquire(self, timeout=None):
+        """
+        :return: PooledBrowser, an idle one if any, raise TimeoutError if none is free within timeout seconds
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while True:
+                if self.closed:
+                    raise RuntimeError('The browser pool is closed')
+                if self.idle:
+                    return self.idle.pop()
+                if (len(self.browsers) + self.starting < self.max_size
+                        and (not self.browsers or self.total_rss(self.browsers) < self.max_rss)):
+                    self.starting += 1
+                    break
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f'No browser free within {timeout}s')
+                self.condition.wait(remaining)
+
+        # Start the browser outside the lock, it takes seconds
+        try:
+            browser = PooledBrowser(self.driver_factory())
+        except Exception:
+            with self.condition:
+                self.starting -= 1
+                self.condition.notify()
+            raise
+
+        with self.condition:
+            self.starting -= 1
+            self.browsers.append(browser)
+            metrics.set('articlescraperbot_browser_pool_size', len(self.browsers))
+        logging.info(f'Started browser {len(self.browsers)}/{self.max_size}')
+        return browser
+
+    def release(self, browser, broken=False):
+        """
+        Return the browser to the pool, or quit it if it is broken, worn out or the pool uses too much memory.
+        """
+        with self.condition:
+            rss = self.total_rss(self.browsers)
+            metrics.set('articlescraperbot_browser_pool_rss_bytes', rss)
+
+            if self.closed or broken or browser.pages >= self.max_pages or rss > self.max_rss:
+                logging.info(f'Recycling browser after {browser.pages} pages, pool memory {rss / 1048576:.0f}MB')
+                self.browsers.remove(browser)
+                metrics.set('articlescraperbot_browser_pool_size', len(self.browsers))
+                quit_browser = browser
+            else:
+                self.idle.append(browser)
+                quit_browser = None
+            self.condition.notify()
+
+        if quit_browser is not None:
+            self.quit(quit_browser)
+
+    @contextlib.contextmanager
+    def lease(self, timeout=None):
+        """
+        with browser_pool.lease() as browser:
+            browser.get(url)
+            html = browser.driver.page_source
+        """
+        browser = self.acquire(timeout)
+        try:
+            yield browser
+        except BaseException:
+            self.release(browser, broken=True)
+            raise
+        self.release(browser)
+
+    @staticmethod
+    def quit(browser):
+        try:
+            browser.driver.quit()
+        except Exception as error:
+            logging.exception(f'Quit browser error: {error}')
+
+    def close(self):
+        """
+        Quit the idle browsers, the leased ones are quit when they are released.
+        """
+        with self.condition:
+            self.closed = True
+            idle, self.idle = self.idle, []
+            for browser in idle:
+                self.browsers.remove(browser)
+            self.condition.notify_all()
+
+        for browser in idle:
+            self.quit(browser)
+
+
+# Shared by every spider of this process, no browser is started until the first lease
+browser_pool = BrowserPool()
@@ -3,15 +3,37 @@
 # Function: push to dingtalk
 # Author: 10935336
 # Creation date: 2023-05-06
-# Modified date: 2024-03-01
+# Modified date: 2026-10-18
 
 
+import collections
+import functools
 import json
 import logging
 import os
+import threading
+import time
 from datetime import datetime
 
-from dingtalkchatbot.chatbot import DingtalkChatbot
+from module.Article import ARTICLE_FIELDS
+from module.Metrics import metrics
+
+
+# webhook -> DingtalkChatbot, one long-lived client per robot shared by every push
+dingtalk_chatbots = {}
+dingtalk_chatbots_lock = threading.Lock()
+
+
+def get_dingtalk_chatbot(webhook, secret):
+    """
+    dingtalkchatbot (and requests with it) is only imported when a message is actually sent,
+    runs with nothing to push do not pay for it.
+    """
+    with dingtalk_chatbots_lock:
+        if webhook not in dingtalk_chatbots:
+            from dingtalkchatbot.chatbot import DingtalkChatbot
+            dingtalk_chatbots[webhook] = DingtalkChatbot(webhook, secret=secret)
+        return dingtalk_chatbots[webhook]
 
 
 def load_dingtalk_bot_conf(dingtalk_bot_conf_path=None):
@@ -27,105 +49,356 @@ def load_dingtalk_bot_conf(dingtalk_bot_conf_path=None):
         logging.exception(f'{dingtalk_bot_conf_path} read error: {error}')
 
 
-def push_new_articles_to_dingtalk(new_articles, dingtalk_bot_conf_path=None):
-    dingtalk_bot_conf_json = load_dingtalk_bot_conf(dingtalk_bot_conf_path)
+class SlidingWindowLimiter:
+    """
+    At most max_messages in any window_seconds, acquire() blocks until the next message may be sent.
+    """
+
+    def __init__(self, max_messages, window_seconds=60):
+        self.max_messages = max_messages
+        self.window_seconds = window_seconds
+        # send times (time.monotonic()) of the last window_seconds, including the ones reserved in the future
+        self.send_times = collections.deque()
+        self.lock = threading.Lock()
+
+    def schedule(self, count, now):
+        """
+        :return: [float] the send times of count more messages, without reserving them
+        """
+        while self.send_times and self.send_times[0] <= now - self.window_seconds:
+            self.send_times.popleft()
+        times = list(self.send_times)
+        for _ in range(count):
+            if len(times) < self.max_messages:
+                times.append(now if not times else max(now, times[-1]))
+            else:
+                times.append(max(now, times[-self.max_messages] + self.window_seconds))
+        return times[len(times) - count:]
+
+    def estimate_wait(self, count):
+        """
+        :return: seconds until count messages have been sent, if nothing else uses this limiter
+        """
+        if count <= 0:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            return max(0.0, self.schedule(count, now)[-1] - now)
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            send_time = self.schedule(1, now)[0]
+            # Reserve the slot now, so concurrent callers queue up behind it
+            self.send_times.append(send_time)
+        if send_time > now:
+            time.sleep(send_time - now)
+
+
+# webhook -> SlidingWindowLimiter, shared by every push in this process
+rate_limiters = {}
+rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(webhook, messages_per_minute=19):
+    """
+    DingTalk allows 20 messages per minute per robot, and DingtalkChatbot itself sleeps until the minute is over
+    when it sends the 20th message in less than 60 seconds.
+    At most 19 messages in any 60 seconds keeps both limits from being reached.
+    """
+    with rate_limiters_lock:
+        if webhook not in rate_limiters:
+            rate_limiters[webhook] = SlidingWindowLimiter(messages_per_minute, 60)
+        return rate_limiters[webhook]
+
+
+# Default message templates, str.format fields, any of them can be overridden in conf/message_templates.json
+DEFAULT_MESSAGE_TEMPLATES = {
+    'article_text': '【{author_name}】发布资讯\n\n渠道：{channel_name}\n\n标题：{title}\n\n链接：{link}'
+                    '\n\n发布时间：{creation_time}',
+    'article_text_footer': '\n\n本次推送共 {total} 条，当前第 {index} 条\n截取于 {snapshot_time}',
+    'article_markdown': '#### 【{author_name}】发布资讯\n\n渠道：{channel_name}\n\n标题：{title}'
+                        '\n\n链接：[{link}]({link})\n\n发布时间：{creation_time}',
+    'markdown_title': '新资讯 {first}-{last}',
+    'markdown_footer': '本次推送共 {total} 条，当前第 {first}-{last} 条\n\n截取于 {snapshot_time}',
+    'summary_header': '从 {start_time} \n到 {end_time}\n【{team_name}】在以下渠道\n',
+    'summary_channel': '{channel_name} 发布 {count} 篇资讯\n',
+    'summary_footer': '总共发送 {total} 篇资讯',
+}
+
+
+@functools.lru_cache(maxsize=None)
+def load_message_templates(message_templates_path=None):
+    """
+    Read once per process, the templates are kept as bound format_map methods.
+
+    :return: {'template name': function taking the dict of fields and returning str}
+    """
+    if message_templates_path is None:
+        module_dir = os.path.dirname(os.path.abspath(__file__))
+        message_templates_path = os.path.join(module_dir, '..', 'conf', 'message_templates.json')
+
+    templates = dict(DEFAULT_MESSAGE_TEMPLATES)
+    if os.path.exists(message_templates_path):
+        try:
+            with open(message_templates_path, 'r', encoding='utf-8') as r:
+                templates.update(json.load(r))
+        except Exception as error:
+            logging.exception(f'{message_templates_path} read error: {error}')
+    return {name: template.format_map for name, template in templates.items()}
 
-    # push
+
+@functools.lru_cache(maxsize=4096)
+def format_timestamp(timestamp, field_name):
     try:
-        if dingtalk_bot_conf_json:
-            for bot in dingtalk_bot_conf_json:
-                webhook = bot['webhook']
-                secret = bot['secret']
-
-                dingtalk_bot = DingtalkChatbot(webhook, secret=secret)
-
-                logging.info(f"Now pushing articles to: {bot['name']}")
-
-                if new_articles:
-                    for i, article in enumerate(new_articles):
-                        author_name = article['author_name']
-                        channel_name = article['channel_name']
-                        title = article['title']
-                        link = article['link']
-
-                        try:
-                            snapshot_time_obj = datetime.fromtimestamp(int(article['snapshot_time']))
-                            snapshot_time = snapshot_time_obj.strftime('%Y-%m-%d %H:%M:%S')
-                        except ValueError as error:
-                            logging.exception(f'cannot parser snapshot_time: {error}')
-                            snapshot_time = '1970-01-01 08:00:00'
-
-                        try:
-                            creation_time_obj = datetime.fromtimestamp(int(article['creation_time']))
-                            creation_time = creation_time_obj.strftime('%Y-%m-%d %H:%M:%S')
-                        except ValueError as error:
-                            logging.exception(f'cannot parser creation_time: {error}')
-                            snapshot_time = '1970-01-01 08:00:00'
-
-                        msg = '【' + str(author_name) + '】发布资讯' \
-                              + '\n\n渠道：' + str(channel_name) \
-                              + '\n\n标题：' + str(title) \
-                              + '\n\n链接：' + str(link) \
-                              + '\n\n发布时间：' + str(creation_time) \
-                              + '\n\n本次推送共 ' + str(len(new_articles)) + ' 条' \
-                              + '，当前第 ' + str(i + 1) + ' 条' \
-                              + '\n截取于 ' + str(snapshot_time)
-
-                        # DingTalk is now limited to sending 20 messages per minute,
-                        # if it exceeds, it will be sent to the waiting queue
-                        dingtalk_bot.send_text(msg=msg, is_at_all=False)
+        return datetime.fromtimestamp(int(timestamp)).strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError as error:
+        logging.exception(f'cannot parser {field_name}: {error}')
+        return '1970-01-01 08:00:00'
+
+
+def article_key(article):
+    """
+    :return: tuple of the fields of an Article or {}, hashable so the rendering can be cached
+    """
+    return tuple(str(article[field]) for field in ARTICLE_FIELDS)
+
+
+@functools.lru_cache(maxsize=4096)
+def render_article(key, template_name):
+    fields = dict(zip(ARTICLE_FIELDS, key))
+    fields['creation_time'] = format_timestamp(fields['creation_time'], 'creation_time')
+    return load_message_templates()[template_name](fields)
+
+
+def format_article_text(article, i, total):
+    templates = load_message_templates()
+    snapshot_time = format_timestamp(str(article['snapshot_time']), 'snapshot_time')
+    return render_article(article_key(article), 'article_text') + templates['article_text_footer'](
+        {'total': total, 'index': i + 1, 'snapshot_time': snapshot_time})
+
+
+def format_article_markdown(article):
+    return render_article(article_key(article), 'article_markdown')
+
+
+@functools.lru_cache(maxsize=64)
+def render_articles_text(keys, first_index=0, total=None):
+    """
+    :param keys: tuple of article_key(), the same batch is rendered once for every robot
+    :param first_index: position of the first article in the whole push, for the footer
+    :param total: number of articles of the whole push, len(keys) if None
+    :return: ((str, 1), (str, 1)) one text message per article, with the number of articles in it
+    """
+    articles = [dict(zip(ARTICLE_FIELDS, key)) for key in keys]
+    total = len(articles) if total is None else total
+    return tuple((format_article_text(article, first_index + i, total), 1) for i, article in enumerate(articles))
+
+
+@functools.lru_cache(maxsize=64)
+def render_articles_markdown(keys, max_message_bytes, first_index=0, total=None):
+    """
+    Pack as many articles as fit into each markdown message,
+    DingTalk rejects messages of about 20000 bytes or more, so max_message_bytes leaves room for the footer.
+
+    :param keys: tuple of article_key(), the same batch is rendered once for every robot
+    :param first_index: position of the first article in the whole push, for the footer
+    :param total: number of articles of the whole push, len(keys) if None
+    :return: ((title, text, number of articles in it), (title, text, number of articles in it))
+    """
+    templates = load_message_templates()
+    separator = '\n\n---\n\n'
+    snapshot_time = format_timestamp(keys[0][ARTICLE_FIELDS.index('snapshot_time')], 'snapshot_time') if keys else ''
+    total = len(keys) if total is None else total
+
+    groups = []
+    blocks = []
+    size = 0
+    for key in keys:
+        block = render_article(key, 'article_markdown')
+        block_size = len(block.encode('utf-8')) + len(separator)
+        if blocks and size + block_size > max_message_bytes:
+            groups.append(blocks)
+            blocks = []
+            size = 0
+        blocks.append(block)
+        size += block_size
+    if blocks:
+        groups.append(blocks)
+
+    msgs = []
+    first = first_index + 1
+    for blocks in groups:
+        last = first + len(blocks) - 1
+        fields = {'total': total, 'first': first, 'last': last, 'snapshot_time': snapshot_time}
+        text = separator.join(blocks + [templates['markdown_footer'](fields)])
+        msgs.append((templates['markdown_title'](fields), text, len(blocks)))
+        first = last + 1
+    return tuple(msgs)
+
+
+def pack_articles_markdown(new_articles, max_message_bytes=18000):
+    """
+    :return: [(title, text), (title, text)], see render_articles_markdown()
+    """
+    return [(title, text) for title, text, _ in
+            render_articles_markdown(tuple(article_key(article) for article in new_articles), max_message_bytes)]
+
+
+def push_new_articles_to_dingtalk_bot(new_articles, bot, pack_articles=None, first_index=0, total=None,
+                                      on_sent=None):
+    """
+    Push the articles to one robot of dingtalk_bot_conf.json, raise if a message is not accepted.
+
+    The webhook is rate limited by its own sliding window, see get_rate_limiter().
+    With pack_articles (or "pack_articles": true of the robot in dingtalk_bot_conf.json),
+    several articles are packed into one markdown message, so fewer messages are sent.
+
+    :param first_index: position of new_articles[0] in the whole push and total its number of articles,
+                        when the outbox delivers the push in several batches, for the "本次推送共" footer
+    :param on_sent: called with the number of articles of each message accepted by the robot,
+                    so the outbox acknowledges them even if a later message fails
+    """
+    if not new_articles:
+        return
+
+    webhook = bot['webhook']
+    secret = bot['secret']
+
+    dingtalk_bot = get_dingtalk_chatbot(webhook, secret)
+    rate_limiter = get_rate_limiter(webhook)
+
+    # Rendered once per batch, the other robots receiving the same batch reuse the messages
+    packed = pack_articles if pack_articles is not None else bot.get('pack_articles', False)
+    keys = tuple(article_key(article) for article in new_articles)
+    if packed:
+        msgs = render_articles_markdown(keys, bot.get('max_message_bytes', 18000), first_index, total)
+    else:
+        msgs = render_articles_text(keys, first_index, total)
+
+    logging.info(f"Now pushing {len(new_articles)} articles in {len(msgs)} messages to: {bot['name']}, "
+                 f"estimated delivery time {rate_limiter.estimate_wait(len(msgs)):.0f}s")
+
+    for msg in msgs:
+        rate_limiter.acquire()
+        with metrics.timer('articlescraperbot_http_request_duration_seconds', histogram=True, client='dingtalk',
+                           endpoint='robot/send'):
+            if packed:
+                result = dingtalk_bot.send_markdown(title=msg[0], text=msg[1], is_at_all=False)
+            else:
+                result = dingtalk_bot.send_text(msg=msg[0], is_at_all=False)
+        if result.get('errcode') != 0:
+            raise RuntimeError(f"{bot['name']} rejected the message: {result}")
+        if on_sent is not None:
+            on_sent(msg[-1])
+
+
+def push_new_articles_to_dingtalk(new_articles, dingtalk_bot_conf_path=None, pack_articles=None):
+    """
+    Push the articles to every robot in dingtalk_bot_conf.json, a failing robot does not stop the others.
+    """
+    dingtalk_bot_conf_json = load_dingtalk_bot_conf(dingtalk_bot_conf_path)
 
-    except Exception as error:
-        logging.exception(f'Push to DingTalk error: {error}')
+    if dingtalk_bot_conf_json:
+        for bot in dingtalk_bot_conf_json:
+            try:
+                push_new_articles_to_dingtalk_bot(new_articles, bot, pack_articles)
+            except Exception as error:
+                logging.exception(f'Push to DingTalk error: {error}')
+
+
+@functools.lru_cache(maxsize=8)
+def render_summary_texts(articles_summary_json):
+    """
+    :param articles_summary_json: json.dumps() of get_articles_summary(), the summary is rendered once for every robot
+    :return: (str, str) one message per team
+    """
+    templates = load_message_templates()
+    articles_summary = json.loads(articles_summary_json)
+    start_time = format_timestamp(str(articles_summary['time']['start_time']), 'articles_summary start_time')
+    end_time = format_timestamp(str(articles_summary['time']['end_time']), 'articles_summary end_time')
+
+    msgs = []
+    for team_name, channels in articles_summary.items():
+        if team_name == "time":
+            continue
+        msg = templates['summary_header']({'start_time': start_time, 'end_time': end_time, 'team_name': team_name})
+        for channel_name, count in channels.items():
+            if channel_name != "total":
+                msg += templates['summary_channel']({'channel_name': channel_name, 'count': count})
+        msg += templates['summary_footer']({'total': channels['total']})
+        msgs.append(msg)
+    return tuple(msgs)
+
+
+def format_summary_texts(articles_summary):
+    """
+    :return: [str] one message per team of get_articles_summary()
+    """
+    return list(render_summary_texts(json.dumps(articles_summary, ensure_ascii=False)))
+
+
+def push_summary_to_dingtalk_bot(articles_summary, bot):
+    """
+    Push the summary to one robot of dingtalk_bot_conf.json, raise if a message is not accepted.
+    """
+    webhook = bot['webhook']
+    secret = bot['secret']
+
+    dingtalk_bot = get_dingtalk_chatbot(webhook, secret)
+    rate_limiter = get_rate_limiter(webhook)
+    msgs = format_summary_texts(articles_summary)
+
+    logging.info(f"Now pushing summary to: {bot['name']}, "
+                 f"estimated delivery time {rate_limiter.estimate_wait(len(msgs)):.0f}s")
+
+    for msg in msgs:
+        rate_limiter.acquire()
+        with metrics.timer('articlescraperbot_http_request_duration_seconds', histogram=True, client='dingtalk',
+                           endpoint='robot/send'):
+            result = dingtalk_bot.send_text(msg=msg, is_at_all=False)
+        if result.get('errcode') != 0:
+            raise RuntimeError(f"{bot['name']} rejected the summary: {result}")
 
 
 def push_summary_to_dingtalk(articles_summary, dingtalk_bot_conf_path=None):
+    """
+    Push the summary to every robot in dingtalk_bot_conf.json, a failing robot does not stop the others.
+    """
     dingtalk_bot_conf_json = load_dingtalk_bot_conf(dingtalk_bot_conf_path)
 
-    # push
-    try:
-        if dingtalk_bot_conf_json:
-            for bot in dingtalk_bot_conf_json:
-                webhook = bot['webhook']
-                secret = bot['secret']
-
-                dingtalk_bot = DingtalkChatbot(webhook, secret=secret)
-
-                logging.info(f"Now pushing summary to: {bot['name']}")
-
-                msgs = []
-                for team_name in articles_summary:
-
-                    try:
-                        start_time_obj = datetime.fromtimestamp(int(articles_summary['time']['start_time']))
-                        start_time = start_time_obj.strftime('%Y-%m-%d %H:%M:%S')
-                    except ValueError as error:
-                        logging.exception(f'cannot parser articles_summary start_time: {error}')
-                        start_time = '1970-01-01 08:00:00'
-
-                    try:
-                        end_time_obj = datetime.fromtimestamp(int(articles_summary['time']['end_time']))
-                        end_time = end_time_obj.strftime('%Y-%m-%d %H:%M:%S')
-                    except ValueError as error:
-                        logging.exception(f'cannot parser articles_summary end_time: {error}')
-                        start_time = '1970-01-01 08:00:00'
-
-                    if team_name != "time":
-                        msg = f"从 {str(start_time)} \n到 {str(end_time)}\n"
-                        msg += f"【{str(team_name)}】在以下渠道\n"
-                        for channel_name in articles_summary[team_name]:
-                            if channel_name != "total":
-                                msg += f"{str(channel_name)} 发布 {str(articles_summary[team_name][channel_name])} 篇资讯\n"
-                        msg += f"总共发送 {str(articles_summary[team_name]['total'])} 篇资讯"
-                        msgs.append(msg)
-
-                for msg in msgs:
-                    # DingTalk is now limited to sending 20 messages per minute,
-                    # if it exceeds, it will be sent to the waiting queue
-                    dingtalk_bot.send_text(msg=msg, is_at_all=False)
-
-    except Exception as error:
-        logging.exception(f'Push to DingTalk error: {error}')
+    if dingtalk_bot_conf_json:
+        for bot in dingtalk_bot_conf_json:
+            try:
+                push_summary_to_dingtalk_bot(articles_summary, bot)
+            except Exception as error:
+                logging.exception(f'Push to DingTalk error: {error}')
+
+
+class DingTalkRobot:
+    """
+    Notifier of notifier_list.json, one sink per robot of dingtalk_bot_conf.json.
+    The configuration is read once, the robots keep one long-lived client per webhook.
+    """
+
+    def __init__(self, dingtalk_bot_conf_path=None, pack_articles=None):
+        self.bots = load_dingtalk_bot_conf(dingtalk_bot_conf_path) or []
+        self.pack_articles = pack_articles
+
+    def get_sinks(self):
+        """
+        :return: {'dingtalk:name': function taking [Article], raising on failure}, see Outbox.deliver()
+        """
+        return {f"dingtalk:{bot['name']}": functools.partial(push_new_articles_to_dingtalk_bot, bot=bot,
+                                                             pack_articles=self.pack_articles)
+                for bot in self.bots}
+
+    def get_summary_sinks(self):
+        """
+        :return: {'dingtalk:name': function taking the summary of get_articles_summary(), raising on failure}
+        """
+        return {f"dingtalk:{bot['name']}": functools.partial(push_summary_to_dingtalk_bot, bot=bot)
+                for bot in self.bots}
 
 
 if __name__ == "__main__":
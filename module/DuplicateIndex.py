@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Function: collapse the same item cross-posted to several channels or authors, by MinHash of the title
+# Author: 10935336
+# Creation date: 2026-10-18
+# Modified date: 2026-10-18
+
+import hashlib
+import re
+import sqlite3
+import struct
+import threading
+import unicodedata
+from datetime import datetime, timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from module.Article import ARTICLE_FIELDS, Article
+from module.PushedRecords import PushedRecords
+from module.SummaryAggregator import split_team_and_channel
+from module.WorkerCoordinator import iter_batches
+
+# Hiragana, katakana, CJK ideographs and hangul, written without spaces between words
+CJK_PATTERN = r'[぀-ヿ㐀-䶿一-鿿가-힯]'
+
+
+def title_features(title):
+    """
+    The words of the title, ignoring bracketed tags, case, width and punctuation,
+    runs of CJK characters are split into character bigrams.
+    e.g. "【Live】 Hello, World!" -> {'hello', 'world'}, "今晚8点直播" -> {'今晚', '8', '点直', '直播'}
+
+    :return: frozenset of str
+    """
+    title = unicodedata.normalize('NFKC', str(title or '')).casefold()
+    title = re.sub(r'\[[^\]]*\]|【[^】]*】', ' ', title)
+    features = set()
+    for part in re.findall(rf'{CJK_PATTERN}+|[^\W_]+?(?={CJK_PATTERN}|[\W_]|$)', title):
+        if re.match(CJK_PATTERN, part) and len(part) > 1:
+            features.update(part[i:i + 2] for i in range(len(part) - 1))
+        else:
+            features.add(part)
+    return frozenset(features)
+
+
+def is_same_title(features, other_features, min_similarity, min_features=3):
+    """
+    Same numbers (episode, issue, date) and a Jaccard similarity of the words of at least min_similarity,
+    so "Weekly Update #45" and "Weekly Update #46" are different items.
+    Titles of fewer than min_features words, e.g. "Official Trailer", are too generic to tell apart.
+    """
+    if len(features) < min_features or len(other_features) < min_features:
+        return False
+    numbers = {feature for feature in features if feature.isdigit()}
+    if numbers != {feature for feature in other_features if feature.isdigit()}:
+        return False
+    return len(features & other_features) / len(features | other_features) >= min_similarity
+
+
+def minhash(features, num_perm=32):
+    """
+    :return: [int] num_perm 16-bit MinHash values of features
+    """
+    values = [0xFFFF] * num_perm
+    for feature in features:
+        digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=2 * num_perm).digest()
+        values = list(map(min, values, struct.unpack(f'>{num_perm}H', digest)))
+    return values
+
+
+def to_timestamp(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_link(link):
+    """
+    Scheme, "www.", trailing slash, fragment and utm_* parameters are ignored.
+    """
+    if not link:
+        return ''
+    parts = urlsplit(str(link).strip())
+    host = parts.netloc.lower().removeprefix('www.')
+    query = urlencode(sorted((key, value) for key, value in parse_qsl(parts.query)
+                             if not key.lower().startswith('utm_')))
+    return f'{host}{parts.path.rstrip("/")}?{query}'
+
+
+def merge_group(group):
+    """
+    One Article standing for a group of copies: the first article, with the channels and authors of all copies.
+    The first article may itself be a merged one, e.g. "youtube / bilibili".
+
+    :param group: [Article] or [{}], the first one is kept
+    :return: Article
+    """
+    article = Article(*(group[0][field] for field in ARTICLE_FIELDS))
+    if len(group) > 1:
+        for field in ('channel_name', 'author_name'):
+            setattr(article, field, ' / '.join(dict.fromkeys(name for copy in group
+                                                             for name in str(copy[field]).split(' / '))))
+    return article
+
+
+class DuplicateIndex:
+    """
+    Locality-sensitive index of the titles and links of the articles pushed in the last records_expire_days.
+
+    Two articles of the same team (see split_team_and_channel()) are copies of one item when they come from
+    different (channel_name, author_id) and their normalized links are equal, or their titles have the same
+    numbers, at least min_features words and min_similarity of them in common (see is_same_title())
+    and they were created at most max_creation_gap seconds apart, so a generic title posted again
+    days later by another member is a new item. Articles of the same author are never collapsed.
+
+    The MinHash of the title words is split into bands of rows_per_band values, titles sharing a band are
+    the candidates checked by is_same_title(), so a lookup is one index probe per band instead of a scan
+    of the window. With 16 bands of 2 rows, titles with a similarity of 0.65 share a band 99.9% of the time.
+    """
+
+    def __init__(self, index_path, records_expire_days=7, min_similarity=0.65, min_features=3,
+                 max_creation_gap=6 * 3600, bands=16, rows_per_band=2):
+        self.index_path = index_path
+        self.records_expire = timedelta(days=records_expire_days)
+        self.min_similarity = min_similarity
+        self.min_features = min_features
+        self.max_creation_gap = max_creation_gap
+        self.bands = bands
+        self.rows_per_band = rows_per_band
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(index_path, timeout=30, check_same_thread=False)
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS titles ('
+                                    'title_id INTEGER PRIMARY KEY, team_name TEXT NOT NULL, source TEXT NOT NULL, '
+                                    'features TEXT NOT NULL, creation_time INTEGER NOT NULL, '
+                                    'group_fingerprint BLOB NOT NULL, push_time REAL NOT NULL)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS titles_push_time ON titles (push_time)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS minhash_bands ('
+                                    'team_name TEXT NOT NULL, band INTEGER NOT NULL, value INTEGER NOT NULL, '
+                                    'title_id INTEGER NOT NULL, PRIMARY KEY (team_name, band, value, title_id)) '
+                                    'WITHOUT ROWID')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS minhash_bands_title_id ON minhash_bands (title_id)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS title_links ('
+                                    'link TEXT NOT NULL, source TEXT NOT NULL, group_fingerprint BLOB NOT NULL, '
+                                    'push_time REAL NOT NULL, PRIMARY KEY (link, source)) WITHOUT ROWID')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS title_links_push_time ON title_links (push_time)')
+
+    def get_bands(self, features):
+        """
+        :return: [(band, value)]
+        """
+        if not features:
+            return []
+        values = minhash(features, self.bands * self.rows_per_band)
+        bands = []
+        for band in range(self.bands):
+            value = 0
+            for row in values[band * self.rows_per_band:(band + 1) * self.rows_per_band]:
+                value = value << 16 | row
+            bands.append((band, value))
+        return bands
+
+    @staticmethod
+    def describe(article):
+        """
+        :return: (team_name, source, title features, normalized link, creation_time int or None)
+        """
+        team_name, _ = split_team_and_channel(article['author_name'], article['channel_name'])
+        source = f"{article['channel_name']}\0{article['author_id']}"
+        return (team_name, source, title_features(article['title']), normalize_link(article['link']),
+                to_timestamp(article['creation_time']))
+
+    def is_copy(self, features, link, creation_time, other_features, other_link, other_creation_time):
+        """
+        Copies by link, or by title when both were created within max_creation_gap of each other.
+        """
+        if link and link == other_link:
+            return True
+        return (creation_time is not None and other_creation_time is not None
+                and abs(creation_time - other_creation_time) <= self.max_creation_gap
+                and is_same_title(features, other_features, self.min_similarity, self.min_features))
+
+    def find_indexed_group(self, team_name, source, features, bands, link, creation_time, since):
+        """
+        :return: group_fingerprint of an article of another source within the window that is a copy, or None
+        """
+        if link:
+            row = self.connection.execute('SELECT group_fingerprint FROM title_links '
+                                          'WHERE link = ? AND source != ? AND push_time >= ?',
+                                          (link, source, since)).fetchone()
+            if row:
+                return row[0]
+
+        # Only titles long enough and created close enough can match, see is_copy()
+        if creation_time is None or len(features) < self.min_features:
+            return None
+        candidates = set()
+        for band, value in bands:
+            candidates.update(row[0] for row in self.connection.execute(
+                'SELECT title_id FROM minhash_bands WHERE team_name = ? AND band = ? AND value = ?',
+                (team_name, band, value)))
+        for batch in iter_batches(candidates):
+            for other_features, group_fingerprint in self.connection.execute(
+                    f'SELECT features, group_fingerprint FROM titles WHERE title_id IN ({",".join("?" * len(batch))}) '
+                    f'AND source != ? AND push_time >= ? AND creation_time BETWEEN ? AND ?',
+                    [*batch, source, since, creation_time - self.max_creation_gap,
+                     creation_time + self.max_creation_gap]):
+                if is_same_title(features, frozenset(other_features.split(' ')), self.min_similarity,
+                                 self.min_features):
+                    return group_fingerprint
+        return None
+
+    def index(self, team_name, source, features, bands, link, creation_time, group_fingerprint, push_time):
+        # The titles that can never match are only indexed by link
+        if creation_time is not None and len(features) >= self.min_features:
+            title_id = self.connection.execute(
+                'INSERT INTO titles (team_name, source, features, creation_time, group_fingerprint, push_time) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (team_name, source, ' '.join(sorted(features)), creation_time, group_fingerprint,
+                 push_time)).lastrowid
+            self.connection.executemany('INSERT OR IGNORE INTO minhash_bands (team_name, band, value, title_id) '
+                                        'VALUES (?, ?, ?, ?)',
+                                        [(team_name, band, value, title_id) for band, value in bands])
+        if link:
+            self.connection.execute('INSERT OR REPLACE INTO title_links (link, source, group_fingerprint, push_time) '
+                                    'VALUES (?, ?, ?, ?)', (link, source, group_fingerprint, push_time))
+
+    def collapse(self, articles, current_time: datetime):
+        """
+        Group the copies in articles, find the copies of articles indexed in the window, then index articles.
+
+        :param articles: [Article] or [{}] not pushed yet
+        :return: ([[Article]] groups to push, the first article of each group first,
+                  [(Article, group_fingerprint)] copies of a group pushed or queued earlier,
+                  group_fingerprint is the PushedRecords.fingerprint() of merge_group() of that group)
+        """
+        since = (current_time - self.records_expire).timestamp()
+        push_time = current_time.timestamp()
+        groups = []
+        copies = []
+        # (team_name, band, value) or link -> indexes in groups
+        buckets = {}
+        # index in groups -> [(source, features, link, creation_time)]
+        members = {}
+        # index in groups -> [(team_name, source, features, bands, link, creation_time)]
+        # to index once the group is complete
+        pending_rows = {}
+
+        with self.lock, self.connection:
+            for article in articles:
+                team_name, source, features, link, creation_time = self.describe(article)
+                bands = self.get_bands(features)
+                row = (team_name, source, features, bands, link, creation_time)
+
+                group_fingerprint = self.find_indexed_group(team_name, source, features, bands, link, creation_time,
+                                                            since)
+                if group_fingerprint is not None:
+                    copies.append((article, group_fingerprint))
+                    self.index(*row, group_fingerprint, push_time)
+                    continue
+
+                keys = [(team_name, band, value) for band, value in bands] + ([link] if link else [])
+                group_index = None
+                for key in keys:
+                    for candidate in buckets.get(key, ()):
+                        if any(member[0] == source for member in members[candidate]):
+                            continue
+                        if any(self.is_copy(features, link, creation_time, *member[1:])
+                               for member in members[candidate]):
+                            group_index = candidate
+                            break
+                    if group_index is not None:
+                        break
+
+                if group_index is None:
+                    group_index = len(groups)
+                    groups.append([])
+                    members[group_index] = []
+                    pending_rows[group_index] = []
+                groups[group_index].append(article)
+                members[group_index].append((source, features, link, creation_time))
+                pending_rows[group_index].append(row)
+                for key in keys:
+                    if group_index not in buckets.setdefault(key, []):
+                        buckets[key].append(group_index)
+
+            for group_index, group in enumerate(groups):
+                group_fingerprint = PushedRecords.fingerprint(merge_group(group))
+                for row in pending_rows[group_index]:
+                    self.index(*row, group_fingerprint, push_time)
+
+        return groups, copies
+
+    def clean_expired(self, current_time: datetime):
+        since = (current_time - self.records_expire).timestamp()
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM minhash_bands WHERE title_id IN '
+                                    '(SELECT title_id FROM titles WHERE push_time < ?)', (since,))
+            self.connection.execute('DELETE FROM titles WHERE push_time < ?', (since,))
+            self.connection.execute('DELETE FROM title_links WHERE push_time < ?', (since,))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
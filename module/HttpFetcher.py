@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Function: shared HTTP GET layer for the spiders, with an on-disk cache, conditional requests,
+#           per-host concurrency limits and coalescing of identical requests
+# Author: 10935336
+# Creation date: 2026-10-18
+# Modified date: 2026-10-18
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from module.Metrics import metrics
+
+
+class FetchedResponse:
+    """
+    The part of requests.Response the spiders use, also built from the cache.
+    """
+
+    def __init__(self, url, status_code, headers, content, from_cache=False, not_modified=False, coalesced=False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        # served from the cache without a request (fresh) or after a 304 (not_modified)
+        self.from_cache = from_cache
+        self.not_modified = not_modified
+        # the response of an identical request of another caller, this caller sent nothing
+        self.coalesced = coalesced
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f'{self.status_code} error for url: {self.url}', response=self)
+
+
+class HttpFetcher:
+    """
+    GET with a response cache in SQLite shared by every spider (and every worker) using the same cache_path.
+
+    - A cached response younger than ttl seconds is returned without a request.
+    - An older one is revalidated with If-None-Match / If-Modified-Since, a 304 returns the cached body.
+    - At most max_per_host requests are in flight per host.
+    - Identical requests made at the same time share one successful call,
+      the callers that joined it get a response with coalesced set, e.g. to not charge an API quota.
+
+    Only 200 responses are cached. The query parameters in ignored_params (e.g. the API key) are not part of
+    the cache key, so the same resource fetched with another key is still a hit.
+    """
+
+    def __init__(self, cache_path, max_per_host=8, request_timeout=30, ignored_params=('key',), headers=None):
+        self.cache_path = cache_path
+        self.max_per_host = max_per_host
+        self.request_timeout = request_timeout
+        self.ignored_params = set(ignored_params)
+        self.lock = threading.Lock()
+        # host -> threading.BoundedSemaphore
+        self.host_semaphores = {}
+        # cache_key -> Future of the request in flight
+        self.inflight = {}
+
+        self.session = requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_per_host)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.connection = sqlite3.connect(cache_path, timeout=30, check_same_thread=False)
+        # A lost cache entry only costs a full request, do not wait for fsync on every response
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS http_cache ('
+                                    'cache_key BLOB PRIMARY KEY, url TEXT NOT NULL, etag TEXT, last_modified TEXT, '
+                                    'headers TEXT NOT NULL, content BLOB NOT NULL, fetch_time REAL NOT NULL)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS http_cache_fetch_time ON http_cache (fetch_time)')
+
+    def cache_key(self, url, params):
+        kept_params = sorted((key, str(value)) for key, value in (params or {}).items()
+                             if key not in self.ignored_params)
+        return hashlib.blake2b(f'{url}?{urlencode(kept_params)}'.encode('utf-8'), digest_size=16).digest()
+
+    def get_host_semaphore(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.host_semaphores:
+                self.host_semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self.host_semaphores[host]
+
+    def load(self, cache_key):
+        with self.lock:
+            row = self.connection.execute('SELECT url, etag, last_modified, headers, content, fetch_time '
+                                          'FROM http_cache WHERE cache_key = ?', (cache_key,)).fetchone()
+        if row is None:
+            return None
+        url, etag, last_modified, headers, content, fetch_time = row
+        return {'url': url, 'etag': etag, 'last_modified': last_modified, 'headers': json.loads(headers),
+                'content': content, 'fetch_time': fetch_time}
+
+    def store(self, cache_key, response):
+        headers = {key: value for key, value in response.headers.items()
+                   if key.lower() in ('content-type', 'etag', 'last-modified')}
+        with self.lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO http_cache (cache_key, url, etag, last_modified, headers, content, fetch_time) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (cache_key, response.url, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                 json.dumps(headers), response.content, time.time()))
+
+    def touch(self, cache_key):
+        with self.lock, self.connection:
+            self.connection.execute('UPDATE http_cache SET fetch_time = ? WHERE cache_key = ?',
+                                    (time.time(), cache_key))
+
+    def get(self, url, params=None, ttl=0, timeout=None):
+        """
+        :param ttl: seconds a cached response is used without revalidation, 0 to always revalidate
+        :return: FetchedResponse
+        """
+        cache_key = self.cache_key(url, params)
+
+        with self.lock:
+            future = self.inflight.get(cache_key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.inflight[cache_key] = future
+
+        if not owner:
+            response = future.result()
+            # An error (e.g. a quota error of the other caller's API key) is not shared
+            if response.status_code == 200:
+                metrics.inc('articlescraperbot_http_cache_total', result='coalesced')
+                return FetchedResponse(response.url, response.status_code, response.headers, response.content,
+                                       response.from_cache, response.not_modified, coalesced=True)
+            return self.fetch(cache_key, url, params, ttl, timeout)
+
+        try:
+            response = self.fetch(cache_key, url, params, ttl, timeout)
+            future.set_result(response)
+            return response
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(cache_key, None)
+
+    def fetch(self, cache_key, url, params, ttl, timeout):
+        cached = self.load(cache_key)
+        if cached is not None and time.time() - cached['fetch_time'] < ttl:
+            metrics.inc('articlescraperbot_http_cache_total', result='hit')
+            return FetchedResponse(cached['url'], 200, cached['headers'], cached['content'], from_cache=True)
+
+        headers = {}
+        if cached is not None:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        with self.get_host_semaphore(url):
+            raw_response = self.session.get(url, params=params, headers=headers,
+                                            timeout=timeout or self.request_timeout)
+
+        if raw_response.status_code == 304 and cached is not None:
+            metrics.inc('articlescraperbot_http_cache_total', result='not_modified')
+            # fetch_time drives ttl and prune(), with ttl 0 refreshing it hourly is enough
+            if ttl > 0 or time.time() - cached['fetch_time'] > 3600:
+                self.touch(cache_key)
+            return FetchedResponse(cached['url'], 200, cached['headers'], cached['content'], not_modified=True)
+
+        metrics.inc('articlescraperbot_http_cache_total', result='miss')
+        response = FetchedResponse(url, raw_response.status_code, raw_response.headers, raw_response.content)
+        if raw_response.status_code == 200 and (ttl > 0 or 'ETag' in raw_response.headers
+                                                or 'Last-Modified' in raw_response.headers):
+            try:
+                self.store(cache_key, response)
+            except Exception as error:
+                logging.exception(f'Cache {url} error: {error}')
+        return response
+
+    def prune(self, max_age_days=7):
+        """
+        Delete the responses not fetched nor revalidated for max_age_days.
+        """
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM http_cache WHERE fetch_time < ?',
+                                    (time.time() - max_age_days * 86400,))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+        self.session.close()
+
+
+# cache_path -> HttpFetcher, shared by the spiders of this process
+http_fetchers = {}
+http_fetchers_lock = threading.Lock()
+
+
+def get_http_fetcher(cache_path, **kwargs):
+    """
+    :return: the HttpFetcher of cache_path, created (and pruned) on first use
+    """
+    with http_fetchers_lock:
+        if cache_path not in http_fetchers:
+            http_fetchers[cache_path] = HttpFetcher(cache_path, **kwargs)
+            http_fetchers[cache_path].prune()
+        return http_fetchers[cache_path]
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Function: in-process metrics written in the Prometheus text format for the node-exporter textfile collector
+# Author: 10935336
+# Creation date: 2026-10-18
+# Modified date: 2026-10-18
+
+import bisect
+import contextlib
+import logging
+import os
+import tempfile
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# name -> (type, help)
+METRICS_DESCRIPTIONS = {
+    'articlescraperbot_stage_duration_seconds': ('gauge', 'Duration of the last run of a pipeline stage.'),
+    'articlescraperbot_spider_duration_seconds': ('gauge', 'Duration of the last start() of a spider.'),
+    'articlescraperbot_articles_total': ('counter', 'Articles fetched, new, deduplicated, near_duplicate and pushed.'),
+    'articlescraperbot_sink_push_total': ('counter', 'Push batches sent to each sink, by result.'),
+    'articlescraperbot_http_request_duration_seconds': ('histogram', 'Latency of outgoing HTTP requests.'),
+    'articlescraperbot_import_duration_seconds': ('gauge', 'Time spent importing a spider module.'),
+    'articlescraperbot_browser_pool_size': ('gauge', 'Browsers started by the browser pool.'),
+    'articlescraperbot_browser_pool_rss_bytes': ('gauge', 'Resident memory of the browsers of the pool.'),
+    'articlescraperbot_last_run_timestamp_seconds': ('gauge', 'Unix time the metrics were last written.'),
+}
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms keyed on (name, labels), thread safe.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        # (name, labels) -> value
+        self.counters = {}
+        self.gauges = {}
+        # (name, labels) -> [bucket counts..., sum, count]
+        self.histograms = {}
+
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self.key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.gauges[self.key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = self.key(name, labels)
+        with self.lock:
+            histogram = self.histograms.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            # The first bucket whose upper bound is >= value, larger values only count in +Inf
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                histogram[index] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    @contextlib.contextmanager
+    def timer(self, name, histogram=False, **labels):
+        """
+        Record the duration of the with block as a gauge, or as a histogram observation.
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start_time
+            if histogram:
+                self.observe(name, duration, **labels)
+            else:
+                self.set(name, duration, **labels)
+
+    def render(self):
+        """
+        :return: str in the Prometheus text exposition format
+        """
+        with self.lock:
+            samples = {}
+            for (name, labels), value in self.counters.items():
+                samples.setdefault(name, []).append(f'{name}{format_labels(labels)} {value}')
+            for (name, labels), value in self.gauges.items():
+                samples.setdefault(name, []).append(f'{name}{format_labels(labels)} {value}')
+            for (name, labels), histogram in self.histograms.items():
+                lines = samples.setdefault(name, [])
+                cumulative = 0
+                for bucket, count in zip(self.buckets, histogram):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{format_labels(labels + (("le", bucket),))} {cumulative}')
+                lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {histogram[-1]}')
+                lines.append(f'{name}_sum{format_labels(labels)} {histogram[-2]}')
+                lines.append(f'{name}_count{format_labels(labels)} {histogram[-1]}')
+
+        output = []
+        for name in sorted(samples):
+            metric_type, metric_help = METRICS_DESCRIPTIONS.get(name, ('untyped', name))
+            output.append(f'# HELP {name} {metric_help}')
+            output.append(f'# TYPE {name} {metric_type}')
+            output.extend(samples[name])
+        return '\n'.join(output) + '\n'
+
+    def write_textfile(self, metrics_dir, file_name='articlescraperbot.prom'):
+        """
+        Write the metrics for the node-exporter textfile collector (--collector.textfile.directory),
+        through a temporary file and a rename so the collector never reads a partial file.
+        """
+        try:
+            self.set('articlescraperbot_last_run_timestamp_seconds', int(time.time()))
+            fd, temp_path = tempfile.mkstemp(dir=metrics_dir, prefix='.' + file_name)
+            with os.fdopen(fd, 'w', encoding='utf-8') as w:
+                w.write(self.render())
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, os.path.join(metrics_dir, file_name))
+        except Exception as error:
+            logging.exception(f'Write metrics to {metrics_dir} error: {error}')
+
+
+# Shared by every module of this process
+metrics = MetricsRegistry()
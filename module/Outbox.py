@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Function: persistent outbox queue between the crawl and the push sinks
+# Author: 10935336
+# Creation date: 2026-10-18
+# Modified date: 2026-10-18
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from module.Article import Article
+from module.DuplicateIndex import merge_group
+from module.Metrics import metrics
+from module.Profiler import profiler
+from module.PushedRecords import PushedRecords
+
+
+class Outbox:
+    """
+    SQLite backed queue of articles waiting to be pushed, one row per (sink, article).
+
+    The crawl only enqueues, deliver() sends the due rows of every sink and acknowledges them per sink,
+    a failed send is retried with exponential backoff until max_attempts, then the row is kept as "dead"
+    for a while, as are the rows of a sink no longer configured.
+    Sent rows are kept as "sent" for a while, so the same article queued again for a sink is not sent twice.
+    """
+
+    def __init__(self, outbox_path, max_attempts=8, base_backoff=30, max_backoff=3600, grace_seconds=120):
+        self.outbox_path = outbox_path
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        # seconds deliver() waits for the batches being sent when its timeout is over
+        self.grace_seconds = grace_seconds
+        self.lock = threading.Lock()
+        # sink_name -> threading.Thread of its last delivery
+        self.delivery_threads = {}
+        self.delivery_threads_lock = threading.Lock()
+        self.connection = sqlite3.connect(outbox_path, timeout=30, check_same_thread=False)
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS outbox ('
+                                    'id INTEGER PRIMARY KEY, sink TEXT NOT NULL, fingerprint BLOB NOT NULL, '
+                                    'article TEXT NOT NULL, status TEXT NOT NULL DEFAULT \'pending\', '
+                                    'attempts INTEGER NOT NULL DEFAULT 0, next_attempt_time REAL NOT NULL, '
+                                    'last_error TEXT, UNIQUE (sink, fingerprint))')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS outbox_due '
+                                    'ON outbox (sink, status, next_attempt_time)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS outbox_fingerprint ON outbox (fingerprint)')
+
+    def enqueue(self, articles, sink_names):
+        """
+        Queue every article for every sink, an article already queued for a sink is ignored.
+        """
+        now = time.time()
+        rows = []
+        for article in articles:
+            fingerprint = PushedRecords.fingerprint(article)
+            article_json = json.dumps(article.to_dict() if isinstance(article, Article) else article,
+                                      ensure_ascii=False)
+            rows.extend((sink_name, fingerprint, article_json, now) for sink_name in sink_names)
+
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT OR IGNORE INTO outbox (sink, fingerprint, article, next_attempt_time) '
+                                        'VALUES (?, ?, ?, ?)', rows)
+
+    def add_copies(self, copies):
+        """
+        Add the channels and authors of copies to the queued articles they are copies of, see merge_group().
+
+        :param copies: [(Article, fingerprint of the queued article)], from DuplicateIndex.collapse()
+        :return: int number of copies merged, the others are copies of articles already sent to every sink
+        """
+        merged = 0
+        with self.lock, self.connection:
+            for copy, fingerprint in copies:
+                rows = self.connection.execute('SELECT id, article FROM outbox '
+                                               'WHERE fingerprint = ? AND status = \'pending\'',
+                                               (fingerprint,)).fetchall()
+                for row_id, article_json in rows:
+                    article = merge_group([json.loads(article_json), copy])
+                    # The fingerprint is kept, so later copies of the item still find this row
+                    self.connection.execute('UPDATE outbox SET article = ? WHERE id = ?',
+                                            (json.dumps(article.to_dict(), ensure_ascii=False), row_id))
+                merged += bool(rows)
+        return merged
+
+    def get_due(self, sink_name, limit, claim_seconds=300):
+        """
+        Claim the due rows of sink_name, they are not due again for claim_seconds unless fail() is called,
+        so several workers delivering from the same outbox never send a row twice.
+
+        :return: ([id, id], [Article, Article]) in the order they were queued
+        """
+        now = time.time()
+        with self.lock, self.connection:
+            rows = self.connection.execute(
+                'UPDATE outbox SET next_attempt_time = ? WHERE id IN ('
+                'SELECT id FROM outbox WHERE sink = ? AND status = \'pending\' AND next_attempt_time <= ? '
+                'ORDER BY id LIMIT ?) RETURNING id, article', (now + claim_seconds, sink_name, now, limit)).fetchall()
+        rows.sort()
+        return [row[0] for row in rows], [Article.from_dict(json.loads(row[1])) for row in rows]
+
+    def ack(self, ids):
+        # Kept as "sent" until prune(), so an article queued again by a duplicate crawl is ignored by enqueue()
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.executemany('UPDATE outbox SET status = \'sent\', next_attempt_time = ? WHERE id = ?',
+                                        [(now, row_id) for row_id in ids])
+
+    def prune(self, sent_retention_days=7, dead_retention_days=30):
+        """
+        Delete the rows sent more than sent_retention_days ago and the rows dead for more than dead_retention_days.
+        """
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM outbox WHERE status = \'sent\' AND next_attempt_time < ?',
+                                    (now - sent_retention_days * 86400,))
+            # next_attempt_time of a dead row is the time it died
+            self.connection.execute('DELETE FROM outbox WHERE status = \'dead\' AND next_attempt_time < ?',
+                                    (now - dead_retention_days * 86400,))
+
+    def retire_unknown_sinks(self, sink_names):
+        """
+        Mark as dead the pending rows of the sinks not in sink_names, e.g. of a robot renamed or removed
+        from the configuration, they would never be delivered, prune() deletes them later.
+
+        :return: {'sink_name': number of rows retired}
+        """
+        sink_names = list(sink_names)
+        with self.lock, self.connection:
+            rows = self.connection.execute(
+                f'UPDATE outbox SET status = \'dead\', next_attempt_time = ?, last_error = \'unknown sink\' '
+                f'WHERE status = \'pending\' AND sink NOT IN ({",".join("?" * len(sink_names))}) RETURNING sink',
+                [time.time(), *sink_names]).fetchall()
+        retired = {}
+        for (sink_name,) in rows:
+            retired[sink_name] = retired.get(sink_name, 0) + 1
+        for sink_name, count in retired.items():
+            logging.warning(f'{count} articles queued for {sink_name}, which is not configured any more, are dropped')
+        return retired
+
+    def fail(self, ids, error):
+        now = time.time()
+        with self.lock, self.connection:
+            for row_id in ids:
+                attempts = self.connection.execute('SELECT attempts FROM outbox WHERE id = ?',
+                                                   (row_id,)).fetchone()[0] + 1
+                status = 'dead' if attempts >= self.max_attempts else 'pending'
+                backoff = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1))
+                self.connection.execute('UPDATE outbox SET attempts = ?, status = ?, next_attempt_time = ?, '
+                                        'last_error = ? WHERE id = ?',
+                                        (attempts, status, now + backoff, str(error), row_id))
+
+    def due_count(self, sink_name):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM outbox WHERE sink = ? AND status = \'pending\' '
+                                           'AND next_attempt_time <= ?', (sink_name, time.time())).fetchone()[0]
+
+    def deliver_sink(self, sink_name, push_func, batch_size=20, deadline=None):
+        """
+        Send the due articles of one sink until none is due, a push fails or the time.monotonic() deadline passes,
+        the deadline is checked between batches.
+
+        Each article is acknowledged as soon as the sink reports it sent through on_sent,
+        so when a message of a batch fails only the articles not sent yet are retried.
+        """
+        # The batches are one push for the "本次推送共 N 条" footer
+        total = self.due_count(sink_name)
+        first_index = 0
+        while deadline is None or time.monotonic() < deadline:
+            ids, articles = self.get_due(sink_name, batch_size)
+            if not ids:
+                break
+            total = max(total, first_index + len(ids))
+            # number of ids of this batch already acknowledged
+            acked = [0]
+
+            def on_sent(count):
+                self.ack(ids[acked[0]:acked[0] + count])
+                acked[0] += count
+
+            try:
+                push_func(articles, first_index=first_index, total=total, on_sent=on_sent)
+            except Exception as error:
+                logging.exception(f'Push to {sink_name} error, will retry: {error}')
+                metrics.inc('articlescraperbot_sink_push_total', sink=sink_name, result='error')
+                metrics.inc('articlescraperbot_articles_total', acked[0], kind='pushed')
+                self.fail(ids[acked[0]:], error)
+                break
+
+            # A sink not calling on_sent acknowledges the whole batch when it returns
+            self.ack(ids[acked[0]:])
+            first_index += len(ids)
+            metrics.inc('articlescraperbot_sink_push_total', sink=sink_name, result='ok')
+            metrics.inc('articlescraperbot_articles_total', len(ids), kind='pushed')
+
+    def run_deliver_sink(self, sink_name, push_func, batch_size, deadline):
+        try:
+            self.deliver_sink(sink_name, push_func, batch_size, deadline)
+        except Exception as error:
+            logging.exception(f'Deliver {sink_name} error: {error}')
+
+    def deliver(self, sinks, batch_size=20, timeout=600, wait=True):
+        """
+        Send the due articles of every sink, each sink in its own daemon thread,
+        so a failing or hanging sink does not affect the others.
+
+        A sink stops taking new batches after timeout seconds (None for no limit), and deliver() waits
+        at most timeout + grace_seconds for the sinks, a sink still sending then (e.g. a webhook that
+        never answers) is left running and skipped by the next deliveries until it returns.
+
+        :param sinks: {'sink_name': push function taking [Article], raising on failure},
+                      and the keyword arguments first_index and total (position of the batch in the whole delivery)
+                      and on_sent (to call with the number of articles of each message the sink accepted)
+        :param wait: False to return once the sinks are started, e.g. for a periodic job
+        """
+        if not sinks:
+            return
+
+        self.prune()
+        self.retire_unknown_sinks(sinks)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        threads = []
+        with self.delivery_threads_lock:
+            for sink_name, push_func in sinks.items():
+                previous = self.delivery_threads.get(sink_name)
+                if previous is not None and previous.is_alive():
+                    logging.warning(f'{sink_name} is still sending since an earlier delivery, skipped')
+                    continue
+                thread = threading.Thread(target=profiler.wrap(self.run_deliver_sink),
+                                          args=(sink_name, push_func, batch_size, deadline),
+                                          name=f'deliver-{sink_name}', daemon=True)
+                self.delivery_threads[sink_name] = thread
+                thread.start()
+                threads.append(thread)
+
+        if wait:
+            self.join_deliveries(None if timeout is None else timeout + self.grace_seconds, threads)
+
+    def join_deliveries(self, timeout=None, threads=None):
+        """
+        Wait at most timeout seconds for the sinks being delivered.
+
+        :return: True if none is still sending
+        """
+        if threads is None:
+            with self.delivery_threads_lock:
+                threads = list(self.delivery_threads.values())
+        end_time = None if timeout is None else time.monotonic() + timeout
+        for thread in threads:
+            thread.join(None if end_time is None else max(0.0, end_time - time.monotonic()))
+            if thread.is_alive():
+                logging.error(f'{thread.name} is still sending after {timeout}s, left running')
+        return not any(thread.is_alive() for thread in threads)
+
+    def pending_count(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM outbox WHERE status = \'pending\'').fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Function: adaptive per-author polling intervals learned from the posting history
+# Author: 10935336
+# Creation date: 2026-10-18
+# Modified date: 2026-10-18
+
+import sqlite3
+import statistics
+import threading
+import time
+
+from module.WorkerCoordinator import iter_batches
+
+
+class PollScheduler:
+    """
+    Decides which authors a spider polls in a run, so the requests go to the authors likely to have posted.
+
+    The interval of an author is rate_factor times its typical gap between posts, between min_interval and
+    max_interval. The typical gap is the median gap between its recent posts, or the time since its last post
+    when that is longer, so an author that went quiet backs off. Each failure in a row doubles the interval.
+
+    Keep max_interval well below the time_threshold of get_new_articles() (one day by default),
+    otherwise an article found late is too old to be pushed.
+    """
+
+    def __init__(self, schedule_path, min_interval=1800, max_interval=21600, rate_factor=0.25, slack=300):
+        """
+        :param slack: seconds, an author due within slack is polled now, so a run started a little early
+                      (cron, daemon) does not skip it until the next run
+        """
+        self.schedule_path = schedule_path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.rate_factor = rate_factor
+        self.slack = slack
+        self.lock = threading.Lock()
+        # (author_id, next_poll_time, interval, failures) not yet written, see flush()
+        self.pending = []
+        self.connection = sqlite3.connect(schedule_path, timeout=30, check_same_thread=False)
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS poll_schedule ('
+                                    'author_id TEXT PRIMARY KEY, next_poll_time REAL NOT NULL, '
+                                    'interval REAL NOT NULL, failures INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID')
+
+    def clamp(self, interval):
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def get_due(self, author_ids, now=None):
+        """
+        :return: set of the author_ids to poll now, authors never polled are due
+        """
+        now = time.time() if now is None else now
+        author_ids = list(set(author_ids))
+        not_due = set()
+        with self.lock:
+            for batch in iter_batches(author_ids):
+                not_due.update(row[0] for row in self.connection.execute(
+                    f'SELECT author_id FROM poll_schedule WHERE next_poll_time > ? '
+                    f'AND author_id IN ({",".join("?" * len(batch))})', [now + self.slack, *batch]))
+        return set(author_ids) - not_due
+
+    def estimate_interval(self, creation_times, now):
+        """
+        :param creation_times: timestamps of the recent posts of an author, in any order
+        :return: float seconds until the next poll
+        """
+        # creation_time is a str timestamp, "0" or None when unknown
+        creation_times = sorted(int(creation_time) for creation_time in creation_times
+                                if str(creation_time).isdigit() and int(creation_time) > 0)
+        if not creation_times:
+            return self.max_interval
+
+        gaps = [later - earlier for earlier, later in zip(creation_times, creation_times[1:]) if later > earlier]
+        typical_gap = statistics.median(gaps) if gaps else self.max_interval / self.rate_factor
+        typical_gap = max(typical_gap, now - creation_times[-1])
+        return self.clamp(typical_gap * self.rate_factor)
+
+    def record_success(self, author_id, creation_times, now=None):
+        now = time.time() if now is None else now
+        interval = self.estimate_interval(creation_times, now)
+        with self.lock:
+            self.pending.append((author_id, now + interval, interval, 0))
+
+    def record_failure(self, author_id, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            row = self.connection.execute('SELECT failures FROM poll_schedule WHERE author_id = ?',
+                                          (author_id,)).fetchone()
+            failures = (row[0] if row else 0) + 1
+            interval = self.clamp(self.min_interval * 2 ** (failures - 1))
+            self.pending.append((author_id, now + interval, interval, failures))
+
+    def flush(self):
+        """
+        Write the intervals recorded since the last flush in one transaction.
+        """
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO poll_schedule '
+                                        '(author_id, next_poll_time, interval, failures) VALUES (?, ?, ?, ?)',
+                                        self.pending)
+            self.pending = []
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
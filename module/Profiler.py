@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Function: opt-in CPU and memory profiling of the spiders and pipeline stages, enabled by main.py --profile
+# Author: 10935336
+# Creation date: 2026-10-18
+# Modified date: 2026-10-18
+
+import contextlib
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+
+from module.BrowserPool import process_tree_rss
+
+
+class Profiler:
+    """
+    Profile named sections of the program, e.g. one spider's start() or one pipeline stage.
+
+    For each section:
+    - cProfile of the thread running it, the top functions are in the report and the raw stats in <name>.prof
+    - tracemalloc snapshots before and after, the lines whose allocations grew the most are in the report,
+      with the process-wide peak of the traced memory while the section ran, sampled with the stacks,
+      both include the memory of the other threads and sections running at the same time
+    - the resident memory of the process and its children (geckodriver, Firefox) at the end of the section
+
+    A sampling thread also records the stacks of the threads inside a section into profile.folded,
+    one "section;frame;frame count" line per stack, which flamegraph.pl, speedscope and inferno read.
+    Work a section hands to other threads (its own thread pool) counts toward the section
+    when the callable is wrapped with wrap() in the section's thread, its cProfile data and stacks are added.
+
+    Disabled until start() is called, section() then costs nothing.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.output_dir = None
+        self.sample_interval = 0.005
+        self.lock = threading.Lock()
+        # name -> {'runs', 'seconds', 'stats', 'peak_bytes', 'rss_bytes', 'growth'}
+        self.sections = {}
+        # thread ident -> name of the section it runs
+        self.thread_sections = {}
+        # thread ident -> process-wide traced memory peak seen while its section runs
+        self.thread_peaks = {}
+        # 'section;frame;frame' -> samples
+        self.stacks = {}
+        self.stop_event = threading.Event()
+        self.sampler = None
+
+    def start(self, output_dir, sample_interval=0.005):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.stop_event.clear()
+        self.sampler = threading.Thread(target=self.sample_loop, name='profiler-sampler', daemon=True)
+        self.sampler.start()
+        self.enabled = True
+        logging.info(f'Profiling into {output_dir}')
+
+    @contextlib.contextmanager
+    def section(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        thread_id = threading.get_ident()
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as error:
+            # Python 3.12+ allows one active cProfile at a time, the sampled stacks still cover this section
+            logging.warning(f'Cannot run cProfile for {name}: {error}')
+            profile = None
+        snapshot = tracemalloc.take_snapshot()
+        # tracemalloc.reset_peak() is process-wide and would reset the peaks of the other running sections,
+        # so the peak of each section is the largest traced memory sampled while it runs
+        with self.lock:
+            self.thread_sections[thread_id] = name
+            self.thread_peaks[thread_id] = tracemalloc.get_traced_memory()[0]
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start_time
+            with self.lock:
+                self.thread_sections.pop(thread_id, None)
+                peak_bytes = max(self.thread_peaks.pop(thread_id, 0), tracemalloc.get_traced_memory()[0])
+            if profile is not None:
+                profile.disable()
+            growth = [statistic for statistic in self.filter_snapshot(tracemalloc.take_snapshot()).compare_to(
+                self.filter_snapshot(snapshot), 'lineno') if statistic.size_diff > 0][:20]
+            self.record(name, seconds, profile, peak_bytes, growth)
+
+    def wrap(self, func):
+        """
+        Run func in the section of the calling thread, wherever it is called, e.g.
+        executor.submit(profiler.wrap(fetch), url)
+
+        :return: func itself when not profiling or not in a section
+        """
+        if not self.enabled:
+            return func
+        with self.lock:
+            name = self.thread_sections.get(threading.get_ident())
+        if name is None:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.worker(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    @contextlib.contextmanager
+    def worker(self, name):
+        """
+        Count the code run inside toward the section name of another thread,
+        only its cProfile data and sampled stacks, the wall time and memory are the section's.
+        """
+        thread_id = threading.get_ident()
+        with self.lock:
+            # Already counted, e.g. a wrapped function run by the section's own thread
+            nested = thread_id in self.thread_sections
+            if not nested:
+                self.thread_sections[thread_id] = name
+        if nested:
+            yield
+            return
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active cProfile at a time, the sampled stacks still cover this thread
+            profile = None
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            with self.lock:
+                self.thread_sections.pop(thread_id, None)
+                if profile is not None:
+                    section = self.new_section(name)
+                    if section['stats'] is None:
+                        section['stats'] = pstats.Stats(profile)
+                    else:
+                        section['stats'].add(profile)
+
+    def new_section(self, name):
+        # called with self.lock held
+        return self.sections.setdefault(name, {'runs': 0, 'seconds': 0.0, 'stats': None, 'peak_bytes': 0,
+                                               'rss_bytes': None, 'growth': []})
+
+    @staticmethod
+    def filter_snapshot(snapshot):
+        # Leave out the memory of the profiler itself
+        return snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__),
+                                       tracemalloc.Filter(False, __file__)])
+
+    def record(self, name, seconds, profile, peak_bytes, growth):
+        with self.lock:
+            section = self.new_section(name)
+            section['runs'] += 1
+            section['seconds'] += seconds
+            if profile is not None:
+                if section['stats'] is None:
+                    section['stats'] = pstats.Stats(profile)
+                else:
+                    section['stats'].add(profile)
+            section['peak_bytes'] = max(section['peak_bytes'], peak_bytes)
+            section['rss_bytes'] = process_tree_rss(os.getpid())
+            # of the last run
+            section['growth'] = growth
+
+    @staticmethod
+    def frame_name(frame):
+        code = frame.f_code
+        return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'.replace(';', ':')
+
+    def sample_loop(self):
+        while not self.stop_event.wait(self.sample_interval):
+            frames = sys._current_frames()
+            traced_bytes = tracemalloc.get_traced_memory()[0]
+            with self.lock:
+                for thread_id, name in self.thread_sections.items():
+                    self.thread_peaks[thread_id] = max(self.thread_peaks.get(thread_id, 0), traced_bytes)
+                    frame = frames.get(thread_id)
+                    stack = []
+                    while frame is not None:
+                        stack.append(self.frame_name(frame))
+                        frame = frame.f_back
+                    folded = ';'.join([name.replace(';', ':'), *reversed(stack)])
+                    self.stacks[folded] = self.stacks.get(folded, 0) + 1
+
+    def format_report(self, name, section):
+        lines = [f'section: {name}',
+                 f'runs: {section["runs"]}, wall time: {section["seconds"]:.3f}s',
+                 f'peak traced memory of the whole process while it ran: {section["peak_bytes"] / 1048576:.1f} MiB']
+        if section['rss_bytes'] is not None:
+            lines.append(f'resident memory of the process tree at the end: {section["rss_bytes"] / 1048576:.1f} MiB')
+
+        lines += ['', 'allocation growth by line (last run):']
+        lines += [f'  {statistic}' for statistic in section['growth']] or ['  none']
+
+        lines += ['', 'top functions by cumulative time, summed over the threads of the section:']
+        if section['stats'] is None:
+            lines.append('  not available, see profile.folded')
+        else:
+            buffer = io.StringIO()
+            section['stats'].stream = buffer
+            section['stats'].sort_stats('cumulative').print_stats(30)
+            lines.append(buffer.getvalue())
+        return '\n'.join(lines) + '\n'
+
+    def write_reports(self):
+        """
+        Write <section>.txt and <section>.prof for every section, and profile.folded.
+        """
+        if not self.enabled:
+            return
+
+        with self.lock:
+            sections = dict(self.sections)
+            stacks = dict(self.stacks)
+
+        for name, section in sections.items():
+            file_name = re.sub(r'[^\w.-]+', '_', name)
+            try:
+                with open(os.path.join(self.output_dir, f'{file_name}.txt'), 'w', encoding='utf-8') as w:
+                    w.write(self.format_report(name, section))
+                if section['stats'] is not None:
+                    section['stats'].dump_stats(os.path.join(self.output_dir, f'{file_name}.prof'))
+            except Exception as error:
+                logging.exception(f'Write profile of {name} error: {error}')
+
+        with open(os.path.join(self.output_dir, 'profile.folded'), 'w', encoding='utf-8') as w:
+            for folded, samples in sorted(stacks.items()):
+                w.write(f'{folded} {samples}\n')
+
+        summary = ', '.join(f'{name} {section["seconds"]:.2f}s {section["peak_bytes"] / 1048576:.1f}MiB'
+                            for name, section in sorted(sections.items(), key=lambda item: -item[1]['seconds']))
+        logging.info(f'Profile written to {self.output_dir}: {summary}')
+
+    def stop(self):
+        """
+        Write the reports and stop profiling.
+        """
+        if not self.enabled:
+            return
+        self.stop_event.set()
+        self.sampler.join()
+        self.write_reports()
+        self.enabled = False
+        tracemalloc.stop()
+
+
+# Shared by every module of this process
+profiler = Profiler()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Function: persistent records of pushed articles, used to avoid pushing an article twice
+# Author: 10935336
+# Creation date: 2026-10-18
+# Modified date: 2026-10-18
+
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+
+class PushedRecords:
+    """
+    SQLite backed records of pushed articles.
+
+    Each record is keyed on a 16-byte fingerprint of the article identity
+    (channel_name, author_id, article_id), so "already pushed?" is a primary key lookup,
+    and expired records are deleted through the push_time index instead of rewriting the whole file.
+    """
+
+    def __init__(self, records_path, records_expire_days=7):
+        self.records_path = records_path
+        self.records_expire = timedelta(days=records_expire_days)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(records_path, timeout=30, check_same_thread=False)
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS pushed_records ('
+                                    'fingerprint BLOB PRIMARY KEY, push_time REAL NOT NULL) WITHOUT ROWID')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS pushed_records_push_time '
+                                    'ON pushed_records (push_time)')
+
+    @staticmethod
+    def fingerprint(article):
+        identity = '\0'.join(str(article[key]) for key in ('channel_name', 'author_id', 'article_id'))
+        return hashlib.blake2b(identity.encode('utf-8'), digest_size=16).digest()
+
+    def is_pushed(self, article, current_time: datetime) -> bool:
+        """
+        :param article: {} or Article
+        :param current_time: class 'datetime.datetime'
+        :return: True if the article was pushed less than records_expire_days ago
+        """
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT 1 FROM pushed_records WHERE fingerprint = ? AND push_time > ?',
+                (self.fingerprint(article), (current_time - self.records_expire).timestamp())).fetchone()
+        return row is not None
+
+    def record(self, articles, current_time: datetime):
+        push_time = current_time.timestamp()
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO pushed_records (fingerprint, push_time) VALUES (?, ?)',
+                [(self.fingerprint(article), push_time) for article in articles])
+
+    def clean_expired(self, current_time: datetime):
+        # Records pushed exactly records_expire_days ago are kept, same as before
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM pushed_records WHERE push_time < ?',
+                                    ((current_time - self.records_expire).timestamp(),))
+
+    def import_pickle_records(self, pickle_path):
+        """
+        Import the records of the old article_pushed_records.pkl, then rename it to *.migrated
+        so that it is only imported once.
+        """
+        try:
+            with open(pickle_path, 'rb') as f:
+                records = pickle.load(f)
+            with self.lock, self.connection:
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO pushed_records (fingerprint, push_time) VALUES (?, ?)',
+                    [(self.fingerprint(record['article']), record['push_time'].timestamp()) for record in records])
+            os.replace(pickle_path, pickle_path + '.migrated')
+            logging.info(f'Imported {len(records)} records from {pickle_path}')
+        except Exception as error:
+            logging.exception(f'{pickle_path} import error: {error}')
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Function: in-process job scheduler used by the daemon mode of main.py
+# Author: 10935336
+# Creation date: 2026-10-18
+# Modified date: 2026-10-18
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+
+class Scheduler:
+    """
+    Run jobs at fixed intervals or at a fixed time of day until stop() is called.
+
+    Jobs that are due at the same time run concurrently on a bounded thread pool.
+    A job is never started again while its previous run is still going, the missed run is skipped.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.stop_event = threading.Event()
+        # heap of (run_time, seq, job)
+        self.jobs = []
+        self.seq = itertools.count()
+
+    def every(self, name, func, interval, run_now=True):
+        """
+        :param interval: seconds between two runs
+        :param run_now: run the job immediately instead of after the first interval
+        """
+        def next_run_time(last_run_time):
+            return max(last_run_time + interval, time.time())
+
+        first_run_time = time.time() if run_now else time.time() + interval
+        self.add_job(name, func, next_run_time, first_run_time)
+
+    def daily_at(self, name, func, hour, minute=0):
+        """
+        :param hour: e.g., 20 is 8pm, local time
+        """
+        def next_run_time(last_run_time):
+            last_run = datetime.fromtimestamp(max(last_run_time, time.time()))
+            run = last_run.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if run <= last_run:
+                run += timedelta(days=1)
+            return run.timestamp()
+
+        self.add_job(name, func, next_run_time, next_run_time(time.time()))
+
+    def add_job(self, name, func, next_run_time, first_run_time):
+        """
+        :param next_run_time: function, takes the timestamp of the last scheduled run and returns the next one
+        """
+        job = {'name': name, 'func': func, 'next_run_time': next_run_time, 'running': threading.Event()}
+        heapq.heappush(self.jobs, (first_run_time, next(self.seq), job))
+
+    def run_job(self, job):
+        try:
+            logging.info(f"Scheduler running job: {job['name']}")
+            job['func']()
+        except Exception as error:
+            logging.exception(f"Scheduler job {job['name']} error: {error}")
+        finally:
+            job['running'].clear()
+
+    def run(self):
+        """
+        Block and run the jobs until stop() is called, then wait for the running jobs to finish.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='scheduler') as executor:
+            while self.jobs and not self.stop_event.is_set():
+                run_time, _, job = self.jobs[0]
+                # Wake up early when stop() is called
+                if self.stop_event.wait(max(0.0, run_time - time.time())):
+                    break
+
+                heapq.heappop(self.jobs)
+                if job['running'].is_set():
+                    logging.warning(f"Scheduler job {job['name']} is still running, skip this run")
+                else:
+                    job['running'].set()
+                    executor.submit(self.run_job, job)
+                heapq.heappush(self.jobs, (job['next_run_time'](run_time), next(self.seq), job))
+
+            logging.info('Scheduler stopped, waiting for running jobs')
+
+    def stop(self):
+        self.stop_event.set()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Function: persistent snapshot of the previously obtained articles, sharded per channel and author
+# Author: 10935336
+# Creation date: 2026-10-18
+# Modified date: 2026-10-18
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from module.WorkerCoordinator import iter_batches
+
+
+class SnapshotStore:
+    """
+    SQLite backed replacement of previous_articles.json, one shard per (channel_name, author_id)
+    holding the article ids of that author seen in the last run.
+
+    update() merges a run into the store: only the shards whose article ids changed are written,
+    and the shards of authors missing from the run (a failed spider or author) are carried forward,
+    so those authors are not seen as new authors next time.
+    load_index() reads only the shards of the authors asked for.
+    """
+
+    def __init__(self, snapshot_path, mmap_size=64 * 1024 * 1024):
+        self.snapshot_path = snapshot_path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(snapshot_path, timeout=30, check_same_thread=False)
+        self.connection.execute(f'PRAGMA mmap_size = {int(mmap_size)}')
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS snapshot ('
+                                    'author_id TEXT NOT NULL, channel_name TEXT NOT NULL, '
+                                    'article_ids TEXT NOT NULL, update_time REAL NOT NULL, '
+                                    'PRIMARY KEY (author_id, channel_name)) WITHOUT ROWID')
+
+    @staticmethod
+    def group_shards(articles_lists):
+        """
+        :return: {('author_id', 'channel_name'): {'article_id', 'article_id'}}
+        """
+        shards = {}
+        for article_list in articles_lists:
+            for article in article_list:
+                if article['article_id'] is None:
+                    continue
+                shards.setdefault((str(article['author_id']), str(article['channel_name'])), set()).add(
+                    str(article['article_id']))
+        return shards
+
+    def load_index(self, author_ids):
+        """
+        :param author_ids: the authors to look up, usually the authors of the current run
+        :return: {'author_id': {'article_id', 'article_id'}} as used by find_new_articles() in main.py,
+                 authors without a shard are left out
+        """
+        author_ids = list(set(author_ids))
+        previous_articles_index = {}
+        with self.lock:
+            for batch in iter_batches(author_ids):
+                rows = self.connection.execute(
+                    f'SELECT author_id, article_ids FROM snapshot WHERE author_id IN ({",".join("?" * len(batch))})',
+                    batch)
+                for author_id, article_ids in rows:
+                    previous_articles_index.setdefault(author_id, set()).update(json.loads(article_ids))
+        return previous_articles_index
+
+    def update(self, articles_lists):
+        """
+        Write the shards of the authors in articles_lists, unchanged shards are not rewritten.
+
+        :param articles_lists: [[Article]] or [[{}]]
+        :return: int number of shards written
+        """
+        now = time.time()
+        rows = [(author_id, channel_name, json.dumps(sorted(article_ids), ensure_ascii=False), now)
+                for (author_id, channel_name), article_ids in self.group_shards(articles_lists).items()]
+
+        with self.lock, self.connection:
+            before = self.connection.total_changes
+            self.connection.executemany(
+                'INSERT INTO snapshot (author_id, channel_name, article_ids, update_time) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (author_id, channel_name) DO UPDATE SET '
+                'article_ids = excluded.article_ids, update_time = excluded.update_time '
+                'WHERE article_ids != excluded.article_ids', rows)
+            return self.connection.total_changes - before
+
+    def import_json_snapshot(self, json_path):
+        """
+        Import the old previous_articles.json, then rename it to *.migrated so that it is only imported once.
+        """
+        try:
+            with open(json_path, 'r', encoding='utf-8') as r:
+                previous_articles_lists = json.load(r)
+            written = self.update(previous_articles_lists)
+            os.replace(json_path, json_path + '.migrated')
+            logging.info(f'Imported {written} snapshot shards from {json_path}')
+        except Exception as error:
+            logging.exception(f'{json_path} import error: {error}')
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Function: lazy registry of the spider modules listed in spider_list.json
+# Author: 10935336
+# Creation date: 2026-10-18
+# Modified date: 2026-10-18
+
+import importlib
+import logging
+import threading
+import time
+
+from module.Metrics import metrics
+
+
+class SpiderRegistry:
+    """
+    Imports a spider module the first time it is asked for and caches its class.
+
+    Only the spiders listed in spider_list.json are imported, so their heavy dependencies
+    (requests, Selenium, bs4...) are not loaded by runs that do not use them.
+    A spider that cannot be imported or instantiated is logged and skipped, the others still load.
+    The notifiers of notifier_list.json are loaded with get_class() the same way.
+    """
+
+    def __init__(self, package='module'):
+        self.package = package
+        self.lock = threading.Lock()
+        # spider_id -> class
+        self.classes = {}
+        # spider_id -> seconds spent importing the module
+        self.import_seconds = {}
+
+    def get_class(self, spider_id):
+        """
+        :param spider_id: module name in the package, the class in it has the same name
+        :return: the spider class, raise ImportError or AttributeError if it cannot be loaded
+        """
+        with self.lock:
+            if spider_id not in self.classes:
+                start_time = time.perf_counter()
+                module = importlib.import_module(f'{self.package}.{spider_id}')
+                import_seconds = time.perf_counter() - start_time
+
+                self.classes[spider_id] = getattr(module, spider_id)
+                self.import_seconds[spider_id] = import_seconds
+                metrics.set('articlescraperbot_import_duration_seconds', import_seconds, module=spider_id)
+                logging.info(f'Imported {self.package}.{spider_id} in {import_seconds:.3f}s')
+            return self.classes[spider_id]
+
+    def create(self, spider):
+        """
+        Instantiate one entry of spider_list.json.
+
+        :param spider: {'spider_id': 'YoutubeSpider', 'object_name': 'youtube', 'timeout': 600, 'interval': 1800}
+        :return: the spider object, None if it cannot be created
+        """
+        try:
+            spider_id = spider['spider_id']
+        except Exception as error:
+            logging.exception(f'Cannot find spider_id in spiders_list entry {spider}: {error}')
+            return None
+
+        try:
+            spider_class = self.get_class(spider_id)
+        except Exception as error:
+            logging.exception(f'Cannot load module {spider_id}: {error}')
+            return None
+
+        try:
+            object_ = spider_class()
+        except Exception as error:
+            logging.exception(f'Instantiating {spider_id} error: {error}')
+            return None
+
+        object_.object_name = spider.get('object_name', spider_id)
+        # optional per-spider deadline in seconds, see get_all_current_articles_lists()
+        if 'timeout' in spider:
+            object_.timeout = spider['timeout']
+        # optional polling interval in seconds of the daemon mode, see run_daemon()
+        if 'interval' in spider:
+            object_.interval = spider['interval']
+        # optional per-author adaptive polling of the spiders supporting it, see PollScheduler
+        for key in ('adaptive_polling', 'poll_min_interval', 'poll_max_interval'):
+            if key in spider:
+                setattr(object_, key, spider[key])
+        return object_
+
+
+# Shared by every module of this process
+spider_registry = SpiderRegistry()
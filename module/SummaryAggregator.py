@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Function: rolling-window article counters used by the summary push
+# Author: 10935336
+# Creation date: 2026-10-18
+# Modified date: 2026-10-18
+
+import functools
+import sqlite3
+import threading
+import time
+
+from module.PushedRecords import PushedRecords
+
+
+@functools.lru_cache(maxsize=None)
+def split_team_and_channel(author_name, channel_name):
+    """
+    "author_name" and "channel_name" can be further subdivided by the new-style named "foo-bar",
+    we will take foo as team_name or channel_name, if there is no "-" then extract all.
+    Cached, so the split is done once per author instead of once per article.
+
+    :return: (team_name, channel_name)
+    """
+    return str(author_name).split('-')[0], str(channel_name).split('-')[0]
+
+
+class SummaryAggregator:
+    """
+    Count articles per team and channel in hourly buckets of creation_time, stored in SQLite.
+
+    Every article is counted once, no matter how many runs see it, so the counts keep growing past
+    what a single snapshot holds (e.g. the 20 latest videos of a busy YouTube author).
+    Any window is answered by summing the buckets, at one hour resolution.
+    """
+
+    def __init__(self, counters_path, bucket_seconds=3600, retention_days=31):
+        self.counters_path = counters_path
+        self.bucket_seconds = bucket_seconds
+        self.retention_seconds = retention_days * 86400
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(counters_path, timeout=30, check_same_thread=False)
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS counted_articles ('
+                                    'fingerprint BLOB PRIMARY KEY, creation_time INTEGER NOT NULL) WITHOUT ROWID')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS counted_articles_creation_time '
+                                    'ON counted_articles (creation_time)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS counters ('
+                                    'bucket INTEGER NOT NULL, team_name TEXT NOT NULL, channel_name TEXT NOT NULL, '
+                                    'count INTEGER NOT NULL, PRIMARY KEY (bucket, team_name, channel_name)) WITHOUT ROWID')
+
+    def add(self, articles_lists):
+        """
+        Count the articles that have not been counted yet.
+
+        :param articles_lists: [[Article]]
+        """
+        oldest_time = int(time.time()) - self.retention_seconds
+        increments = {}
+
+        with self.lock, self.connection:
+            for article_list in articles_lists:
+                for article in article_list:
+                    try:
+                        creation_time = int(article['creation_time'])
+                    except (TypeError, ValueError):
+                        continue
+                    if creation_time < oldest_time:
+                        continue
+
+                    cursor = self.connection.execute(
+                        'INSERT OR IGNORE INTO counted_articles (fingerprint, creation_time) VALUES (?, ?)',
+                        (PushedRecords.fingerprint(article), creation_time))
+                    if cursor.rowcount != 1:
+                        continue
+
+                    team_name, channel_name = split_team_and_channel(article['author_name'], article['channel_name'])
+                    key = (creation_time - creation_time % self.bucket_seconds, team_name, channel_name)
+                    increments[key] = increments.get(key, 0) + 1
+
+            self.connection.executemany(
+                'INSERT INTO counters (bucket, team_name, channel_name, count) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (bucket, team_name, channel_name) DO UPDATE SET count = count + excluded.count',
+                [key + (count,) for key, count in increments.items()])
+
+    def summary(self, start_time, end_time):
+        """
+        :return {'team_name' : {'channel_name': num,'channel_name': 'num',total: 'num'}, 'time': {'start_time': start_time, 'end_time': end_time}}
+        same as get_articles_summary() in main.py
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT team_name, channel_name, SUM(count) FROM counters WHERE bucket >= ? AND bucket <= ? '
+                'GROUP BY team_name, channel_name',
+                (start_time - start_time % self.bucket_seconds, end_time)).fetchall()
+
+        channel_article_count = {}
+        for team_name, channel_name, count in rows:
+            channel_article_count.setdefault(team_name, {})[channel_name] = count
+        for team_name, channel_info in channel_article_count.items():
+            channel_info['total'] = sum(channel_info.values())
+
+        channel_article_count['time'] = {'start_time': start_time, 'end_time': end_time}
+        return channel_article_count
+
+    def prune(self):
+        """
+        Delete the buckets and counted articles older than retention_days.
+        """
+        oldest_time = int(time.time()) - self.retention_seconds
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM counters WHERE bucket < ?', (oldest_time,))
+            self.connection.execute('DELETE FROM counted_articles WHERE creation_time < ?', (oldest_time,))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
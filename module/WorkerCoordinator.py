@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Function: split the authors across several worker processes on one host by consistent hashing
+# Author: 10935336
+# Creation date: 2026-10-18
+# Modified date: 2026-10-18
+
+import bisect
+import contextlib
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, the files are only shared by workers on Unix
+    fcntl = None
+
+
+@contextlib.contextmanager
+def locked_file(path):
+    """
+    Hold an exclusive lock on path + '.lock' for read-modify-write of a JSON file shared by the workers.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    with open(path + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def iter_batches(values, size=500):
+    """
+    Split values into lists of at most size items for "IN (?, ?, ...)" queries,
+    SQLite limits the number of "?" in one statement.
+    """
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+class HashRing:
+    """
+    Consistent hash ring, each worker owns replicas points on it and a key belongs to the next point clockwise,
+    so adding or removing a worker only moves about 1/N of the keys.
+    """
+
+    def __init__(self, workers, replicas=100):
+        self.workers = tuple(sorted(workers))
+        points = sorted((self.hash(f'{worker}#{i}'), worker) for worker in self.workers for i in range(replicas))
+        self.hashes = [point[0] for point in points]
+        self.owners = [point[1] for point in points]
+
+    @staticmethod
+    def hash(key):
+        return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+    def get_worker(self, key):
+        """
+        :return: worker id owning key, None if the ring is empty
+        """
+        if not self.hashes:
+            return None
+        return self.owners[bisect.bisect(self.hashes, self.hash(key)) % len(self.hashes)]
+
+
+class WorkerCoordinator:
+    """
+    Membership of the workers through a SQLite file they all can open, e.g. in the program directory.
+
+    Each worker calls join() at start and heartbeat() regularly, a worker without heartbeat for heartbeat_ttl
+    seconds is dropped and its authors move to the others. While the membership changes the workers may see
+    different rings for up to one heartbeat interval, an author can then be crawled twice (the outbox ignores
+    the copy already sent) or skipped until the next crawl. The live worker with the smallest id is the leader,
+    it pushes the daily summary.
+    """
+
+    def __init__(self, coordination_path, worker_id, heartbeat_ttl=120, replicas=100):
+        self.coordination_path = coordination_path
+        self.worker_id = worker_id
+        self.heartbeat_ttl = heartbeat_ttl
+        self.replicas = replicas
+        self.lock = threading.Lock()
+        self.ring = HashRing([worker_id], replicas)
+        # Several processes write this file, wait for their locks instead of failing
+        self.connection = sqlite3.connect(coordination_path, timeout=30, check_same_thread=False)
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS workers ('
+                                    'worker_id TEXT PRIMARY KEY, heartbeat_time REAL NOT NULL) WITHOUT ROWID')
+
+    def heartbeat(self):
+        """
+        Record that this worker is alive and rebuild the ring from the live workers.
+        """
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO workers (worker_id, heartbeat_time) VALUES (?, ?)',
+                                    (self.worker_id, now))
+            workers = [row[0] for row in self.connection.execute(
+                'SELECT worker_id FROM workers WHERE heartbeat_time > ?', (now - self.heartbeat_ttl,))]
+
+            if tuple(sorted(workers)) != self.ring.workers:
+                logging.info(f'Workers changed from {list(self.ring.workers)} to {sorted(workers)}')
+                self.ring = HashRing(workers, self.replicas)
+
+    def join(self, settle_seconds, max_rounds=5):
+        """
+        Register and wait until the live workers stop changing, so the workers starting together agree on the ring
+        before this one takes its authors. The other workers see this one at their next heartbeat,
+        until then they still crawl its authors, so settle_seconds should be their heartbeat interval.
+        """
+        self.heartbeat()
+        for _ in range(max_rounds):
+            workers = self.ring.workers
+            time.sleep(settle_seconds)
+            self.heartbeat()
+            if self.ring.workers == workers:
+                break
+        logging.info(f'Worker {self.worker_id} joined {list(self.ring.workers)}')
+
+    def owns(self, author_id):
+        """
+        The author_filter of the spiders, True if this worker crawls author_id.
+        """
+        return self.ring.get_worker(str(author_id)) == self.worker_id
+
+    def is_leader(self):
+        return self.ring.workers[0] == self.worker_id
+
+    def leave(self):
+        """
+        Remove this worker at shutdown, the others take over its authors at their next heartbeat.
+        """
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM workers WHERE worker_id = ?', (self.worker_id,))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -4,25 +4,184 @@
 # Note: Need API Key :https://console.cloud.google.com/apis/api/youtube.googleapis.com
 # Author: 10935336
 # Creation date: 2023-05-12
-# Modified date: 2023-05-12
+# Modified date: 2026-10-18
 
+import hashlib
 import json
 import logging
 import os
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
 
-import requests
+from module.Article import Article, articles_to_json
+from module.HttpFetcher import get_http_fetcher
+from module.Metrics import metrics
+from module.PollScheduler import PollScheduler
+from module.Profiler import profiler
+from module.WorkerCoordinator import locked_file
+
+
+class QuotaExhaustedError(RuntimeError):
+    pass
+
+
+class YoutubeApiKeyPool:
+    """
+    Spread the requests over every API key and account for the quota units each key has used today.
+
+    A key is taken out of rotation when it reaches its daily_quota or the API answers 403 quotaExceeded.
+    The usage is saved to youtube_apikey_usage.json, keyed on a hash of the API key,
+    and is reset when the quota day changes (midnight Pacific Time, like the YouTube quota).
+    """
+
+    # quota cost of each method, https://developers.google.com/youtube/v3/determine_quota_cost
+    QUOTA_COSTS = {'playlistItems': 1, 'channels': 1}
+
+    def __init__(self, api_key_list, usage_path, default_daily_quota=10000):
+        self.usage_path = usage_path
+        self.lock = threading.Lock()
+        # api_key -> daily quota, "daily_quota" can be set per key in youtube_apikey_list.json
+        self.daily_quotas = {key['api_key']: key.get('daily_quota', default_daily_quota) for key in api_key_list}
+        self.key_ids = {api_key: self.key_id(api_key) for api_key in self.daily_quotas}
+        self.quota_day = self.get_quota_day()
+        self.usage = {}
+        # usage charged since the last save_usage(), added to the file so workers sharing the keys add up
+        self.unsaved_usage = {}
+        self.load_usage()
+
+    @staticmethod
+    def get_quota_day():
+        try:
+            quota_timezone = ZoneInfo('America/Los_Angeles')
+        except Exception:
+            # No tz database, e.g. Windows without tzdata
+            quota_timezone = timezone(timedelta(hours=-8))
+        return datetime.now(quota_timezone).date().isoformat()
+
+    @staticmethod
+    def key_id(api_key):
+        return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+
+    def load_usage(self):
+        try:
+            with open(self.usage_path, 'r', encoding='utf-8') as r:
+                usage_json = json.load(r)
+            if usage_json.get('day') == self.quota_day:
+                self.usage = usage_json.get('usage', {})
+        except FileNotFoundError:
+            pass
+        except Exception as error:
+            logging.exception(f'{self.usage_path} read error: {error}')
+
+    def save_usage(self):
+        try:
+            with locked_file(self.usage_path), self.lock:
+                # Other workers may have charged the same keys since load_usage()
+                saved_usage = {}
+                try:
+                    with open(self.usage_path, 'r', encoding='utf-8') as r:
+                        usage_json = json.load(r)
+                    if usage_json.get('day') == self.quota_day:
+                        saved_usage = usage_json.get('usage', {})
+                except FileNotFoundError:
+                    pass
+
+                for key_id, used in self.usage.items():
+                    saved_usage[key_id] = max(saved_usage.get(key_id, 0) + self.unsaved_usage.get(key_id, 0), used)
+                self.usage = saved_usage
+                self.unsaved_usage = {}
+
+                with open(self.usage_path, 'w', encoding='utf-8') as w:
+                    json.dump({'day': self.quota_day, 'usage': saved_usage}, w)
+        except Exception as error:
+            logging.exception(f'{self.usage_path} write error: {error}')
+
+    def acquire(self, method):
+        """
+        Take the least used key that still has quota for method and charge it.
+
+        :return: api_key, None if every key is out of quota
+        """
+        cost = self.QUOTA_COSTS.get(method, 1)
+        with self.lock:
+            quota_day = self.get_quota_day()
+            if quota_day != self.quota_day:
+                self.quota_day = quota_day
+                self.usage = {}
+                self.unsaved_usage = {}
+
+            available_keys = [api_key for api_key, daily_quota in self.daily_quotas.items()
+                              if self.usage.get(self.key_ids[api_key], 0) + cost <= daily_quota]
+            if not available_keys:
+                return None
+
+            api_key = min(available_keys, key=lambda k: self.usage.get(self.key_ids[k], 0))
+            key_id = self.key_ids[api_key]
+            self.usage[key_id] = self.usage.get(key_id, 0) + cost
+            self.unsaved_usage[key_id] = self.unsaved_usage.get(key_id, 0) + cost
+            return api_key
+
+    def refund(self, api_key, method):
+        """
+        Give back the quota charged by acquire() for a request that was not sent.
+        """
+        cost = self.QUOTA_COSTS.get(method, 1)
+        with self.lock:
+            key_id = self.key_ids[api_key]
+            if key_id in self.unsaved_usage:
+                self.usage[key_id] = max(0, self.usage.get(key_id, 0) - cost)
+                self.unsaved_usage[key_id] = max(0, self.unsaved_usage[key_id] - cost)
+
+    def mark_exhausted(self, api_key):
+        with self.lock:
+            logging.warning(f'YouTube API key {self.key_ids[api_key]} is out of quota, taken out of rotation')
+            self.usage[self.key_ids[api_key]] = self.daily_quotas[api_key]
+
+    @staticmethod
+    def is_quota_exceeded(response):
+        try:
+            reasons = [error['reason'] for error in response.json()['error']['errors']]
+        except Exception:
+            return False
+        return 'quotaExceeded' in reasons or 'dailyLimitExceeded' in reasons
 
 
 class YoutubeSpider:
     def __init__(self):
-        self.articles_json = ''
+        self.articles = []
+        # set by the main program when this spider exceeds its deadline
+        self.cancel_event = threading.Event()
+        # seconds, timeout of a single HTTP request
+        self.request_timeout = 30
+        # maximum number of authors fetched at the same time
+        self.max_workers = 8
+        self.http_fetcher = None
+        self.api_base_url = 'https://www.googleapis.com/youtube/v3/'
+        # directory of the runtime files (caches, cursors, key usage), the program directory by default
+        self.data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
         self.api_key_list = []
+        self.api_key_pool = None
+        self.cursors = {}
+        self.cursors_path = None
         self.authors_list = []
+        # set by the main program in sharded mode, author_id -> True if this worker crawls the author
+        self.author_filter = None
+        # "adaptive_polling", "poll_min_interval" and "poll_max_interval" of spider_list.json, see PollScheduler
+        self.adaptive_polling = False
+        self.poll_min_interval = 1800
+        self.poll_max_interval = 21600
+        self.poll_scheduler = None
         self.headers = {
             'user-agent': 'Mozilla/5.0 (Linux; Android 13.0; Nexus 15 Build/MRA99N) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/112.0.0.0 Mobile Safari/537.36',
         }
 
+    @property
+    def articles_json(self):
+        # Compatibility with spiders that only provide articles_json, built only when it is read
+        return articles_to_json(self.articles)
+
     def load_api_key(self, api_key_path):
         try:
             with open(api_key_path, 'r', encoding='utf-8') as r:
@@ -37,126 +196,336 @@ class YoutubeSpider:
         except Exception as error:
             logging.exception(f'{authors_list_path} read error: {error}')
 
-    def fill_uploads_id_for_authors_list(self, authors_list_path=None, write_back=True):
+    def fill_uploads_id_for_authors_list(self, uploads_id_cache_path=None, cache_valid_days=30, batch_size=50):
+        """
+        Fill uploads_id of every author that does not have one in youtube_authors_list.json.
 
-        def get_uploads_id_by_id(channel_id, api_key):
+        The ids are resolved with one channels request per batch_size (the API maximum is 50) channels
+        and kept in youtube_uploads_id_cache.json for cache_valid_days days, the authors list file is not modified.
+        """
 
-            url = "https://www.googleapis.com/youtube/v3/channels?" + \
-                  "id=" + str(channel_id) + \
-                  "&key=" + str(api_key) + \
-                  "&part=contentDetails"
+        def load_uploads_id_cache(uploads_id_cache_path):
             try:
-                response = requests.get(url=url, headers=self.headers)
-                if response.status_code == 200:
-                    raw_json_unescaped = json.loads(response.text)
-                    uploads_id = raw_json_unescaped["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
-                    return uploads_id
+                with open(uploads_id_cache_path, 'r', encoding='utf-8') as r:
+                    return json.load(r)
+            except FileNotFoundError:
+                return {}
             except Exception as error:
-                logging.exception(f'get uploads_id error: {error}')
+                logging.exception(f'{uploads_id_cache_path} read error: {error}')
+                return {}
 
-        def write_uploads_id_back_to_list(authors_list_path):
+        def save_uploads_id_cache(uploads_id_cache, uploads_id_cache_path):
             try:
-                with open(authors_list_path, 'w', encoding='utf-8') as w:
-                    json.dump(self.authors_list, w, ensure_ascii=False)
+                # Keep the entries resolved by other workers meanwhile
+                with locked_file(uploads_id_cache_path):
+                    uploads_id_cache = {**load_uploads_id_cache(uploads_id_cache_path), **uploads_id_cache}
+                    with open(uploads_id_cache_path, 'w', encoding='utf-8') as w:
+                        json.dump(uploads_id_cache, w, ensure_ascii=False)
             except Exception as error:
-                logging.exception(f'{authors_list_path} write error: {error}')
+                logging.exception(f'{uploads_id_cache_path} write error: {error}')
 
-        if authors_list_path is None:
-            module_dir = os.path.dirname(os.path.abspath(__file__))
-            authors_list_path = os.path.join(module_dir, '..', 'conf', 'youtube_authors_list.json')
+        def get_uploads_ids_by_ids(channel_ids):
+            """
+            :return: {'channel_id': 'uploads_id'}, channels that do not exist are left out
+            """
+            params = {
+                'id': ','.join(channel_ids),
+                'part': 'contentDetails',
+                'maxResults': len(channel_ids)
+            }
+            try:
+                response = self.api_get('channels', params)
+                raw_json_unescaped = json.loads(response.text)
+                return {item['id']: item['contentDetails']['relatedPlaylists']['uploads']
+                        for item in raw_json_unescaped.get('items', [])}
+            except Exception as error:
+                logging.exception(f'get uploads_id error: {error}')
+                return {}
+
+        if uploads_id_cache_path is None:
+            uploads_id_cache_path = os.path.join(self.data_dir, 'youtube_uploads_id_cache.json')
+
+        uploads_id_cache = load_uploads_id_cache(uploads_id_cache_path)
+        current_time = int(datetime.now().timestamp())
+        cache_valid_seconds = cache_valid_days * 86400
 
         try:
-            for key in self.api_key_list:
-                api_key = key['api_key']
-            # Check if the author list has uploads_id, if not, add it
+            # Channels without uploads_id and without a valid cache entry
+            unresolved_ids = []
+            unresolved_ids_set = set()
+            for item in self.authors_list:
+                if 'uploads_id' in item:
+                    continue
+                cached = uploads_id_cache.get(item['author_id'])
+                if cached is None or current_time - cached['resolved_time'] > cache_valid_seconds:
+                    if item['author_id'] not in unresolved_ids_set:
+                        unresolved_ids.append(item['author_id'])
+                        unresolved_ids_set.add(item['author_id'])
+
+            if unresolved_ids:
+                for i in range(0, len(unresolved_ids), batch_size):
+                    channel_ids = unresolved_ids[i:i + batch_size]
+                    uploads_ids = get_uploads_ids_by_ids(channel_ids)
+                    for channel_id in channel_ids:
+                        if channel_id in uploads_ids:
+                            uploads_id_cache[channel_id] = {'uploads_id': uploads_ids[channel_id],
+                                                            'resolved_time': current_time}
+                        else:
+                            logging.warning(f'Cannot get uploads_id of {channel_id}')
+                save_uploads_id_cache(uploads_id_cache, uploads_id_cache_path)
+
             for item in self.authors_list:
-                if 'uploads_id' not in item:
-                    author_id = item['author_id']
-                    uploads_id_value = get_uploads_id_by_id(author_id, api_key)
-                    item['uploads_id'] = uploads_id_value
+                if 'uploads_id' not in item and item['author_id'] in uploads_id_cache:
+                    item['uploads_id'] = uploads_id_cache[item['author_id']]['uploads_id']
         except Exception as error:
             logging.exception(f'Get author_id error: {error}')
 
-        if write_back:
-            write_uploads_id_back_to_list(authors_list_path)
+    def api_get(self, method, params):
+        """
+        GET the YouTube Data API method with a key from the key pool.
+        A key answered with 403 quotaExceeded is taken out of rotation and the request is sent again with another key.
 
-    def get_articles_list(self, retry_times=3, max_results=20, part='snippet'):
-        new_list = []
-        current_time = int(datetime.now().timestamp())
+        :return: HttpFetcher.FetchedResponse
+        """
+        while True:
+            api_key = self.api_key_pool.acquire(method)
+            if api_key is None:
+                raise QuotaExhaustedError('Every YouTube API key is out of quota')
+
+            with metrics.timer('articlescraperbot_http_request_duration_seconds', histogram=True,
+                               client='youtube', endpoint=method):
+                # Revalidated with the ETag of the last response, an unchanged playlist page comes back as 304
+                response = self.get_http_fetcher().get(self.api_base_url + method, params={**params, 'key': api_key})
+            # Only the caller that sent the request is charged, not the ones sharing its response
+            if response.coalesced or response.from_cache:
+                self.api_key_pool.refund(api_key, method)
+            if response.status_code == 403 and self.api_key_pool.is_quota_exceeded(response):
+                self.api_key_pool.mark_exhausted(api_key)
+                continue
+
+            response.raise_for_status()
+            return response
+
+    def get_http_fetcher(self):
+        # Shared with every spider using the same data_dir, reused by every run in daemon mode
+        if self.http_fetcher is None:
+            self.http_fetcher = get_http_fetcher(os.path.join(self.data_dir, 'http_cache.sqlite3'),
+                                                 max_per_host=self.max_workers, request_timeout=self.request_timeout,
+                                                 headers=self.headers)
+        return self.http_fetcher
+
+    def fetch_author_videos(self, uploads_id, cursor, max_results=20, quiet_page_size=5, burst_page_size=50,
+                            max_pages=10, part='snippet'):
+        """
+        Page through the uploads playlist (newest first) until the video of the cursor is reached.
 
+        Without a cursor only the first max_results videos are fetched.
+        With a cursor the first page is small (quiet_page_size), and pages of burst_page_size are followed
+        through nextPageToken while the known video has not been reached, so bursts are not lost.
+
+        :return: [{'article_id': '', 'title': '', 'creation_time': ''}] of the videos newer than the cursor
+        """
+        videos = []
+        params = {
+            'playlistId': uploads_id,
+            'part': part,
+            'maxResults': quiet_page_size if cursor else max_results
+        }
+
+        for page in range(max_pages):
+            response = self.api_get('playlistItems', params)
+            raw_json_unescaped = json.loads(response.text)
+
+            # Iterate through the list in the raw JSON data
+            for item in raw_json_unescaped["items"]:
+                video_id = item["snippet"]["resourceId"]["videoId"]
+
+                # time
+                datetime_obj = datetime.strptime(item["snippet"]["publishedAt"], "%Y-%m-%dT%H:%M:%SZ")
+                timestamp = int(datetime_obj.timestamp())
+
+                # Reached the last seen video
+                if cursor and (video_id == cursor['article_id'] or timestamp < int(cursor['creation_time'])):
+                    return videos
+
+                videos.append({'article_id': video_id, 'title': item["snippet"]["title"],
+                               'creation_time': str(timestamp)})
+
+            next_page_token = raw_json_unescaped.get('nextPageToken')
+            if not cursor or not next_page_token:
+                return videos
+
+            params['pageToken'] = next_page_token
+            params['maxResults'] = burst_page_size
+
+        logging.warning(f'{uploads_id} has more than {max_pages} pages of new videos, the rest is skipped')
+        return videos
+
+    def get_author_articles(self, author, current_time, retry_times=3, max_results=20, part='snippet'):
+        """
+        Get the latest videos of one author, retrying this author only.
+
+        Only the videos newer than the author's cursor are fetched,
+        they are merged with the videos remembered by the cursor so that at least max_results videos are returned.
+
+        :return: [Article, Article], [] if every attempt failed
+        """
         try:
-            for key in self.api_key_list:
-                api_key = key['api_key']
+            author_id_l = author['author_id']
+            author_name_l = author['author_name']
+            uploads_id_l = author['uploads_id']
         except Exception as error:
-            logging.exception(f'Cannot find wanted value in api_key_list: {error}')
+            logging.exception(f'Cannot find wanted value in authors_list: {error}')
+            return []
+
+        cursor = self.cursors.get(author_id_l)
+
+        for retry in range(retry_times):
+            if self.cancel_event.is_set():
+                logging.warning(f'{self} is cancelled')
+                return []
+
+            try:
+                videos = self.fetch_author_videos(uploads_id_l, cursor, max_results=max_results, part=part)
+                break
+            except QuotaExhaustedError as error:
+                logging.error(f'Cannot get {author_id_l}: {error}')
+                return []
+            except Exception as error:
+                logging.exception(f"Error getting or parsing the response of {author_id_l}: {error}")
+                # Back off before the next attempt, wake up early when cancelled
+                if retry + 1 < retry_times:
+                    self.cancel_event.wait(2 ** retry)
+        else:
+            logging.warning(f"Max retries is exceeded for {author_id_l} in {self}")
+            return []
+
+        if cursor:
+            videos += cursor['recent'][:max(0, max_results - len(videos))]
+        if videos:
+            self.cursors[author_id_l] = {'article_id': videos[0]['article_id'],
+                                         'creation_time': videos[0]['creation_time'],
+                                         'recent': videos}
+
+        return [
+            Article(
+                title=video['title'],
+                article_id=video['article_id'],
+                author_name=author_name_l,
+                author_id=author_id_l,
+                channel_name="Youtube",
+                link="https://www.youtube.com/watch?v=" + video['article_id'],
+                creation_time=video['creation_time'],
+                snapshot_time=str(current_time)
+            )
+            for video in videos
+        ]
+
+    def get_articles_list(self, retry_times=3, max_results=20, part='snippet'):
+        current_time = int(datetime.now().timestamp())
 
         # Check if the author list has uploads_id, if not, add it
         try:
-            for item in self.authors_list:
-                if 'uploads_id' not in item:
-                    self.fill_uploads_id_for_authors_list()
+            if any('uploads_id' not in item for item in self.authors_list):
+                self.fill_uploads_id_for_authors_list()
         except Exception as error:
             logging.exception(f'Get uploads_id error: {error}')
 
-        for retry in range(retry_times):
-            try:
-                for author in self.authors_list:
-                    try:
-                        author_id_l = author['author_id']
-                        author_name_l = author['author_name']
-                        uploads_id_l = author['uploads_id']
-                    except Exception as error:
-                        logging.exception(f'Cannot find wanted value in authors_list: {error}')
-
-                    url = "https://www.googleapis.com/youtube/v3/playlistItems?" + \
-                          "playlistId=" + str(uploads_id_l) + \
-                          "&key=" + str(api_key) + \
-                          "&part=" + str(part) + \
-                          "&maxResults=" + str(max_results)
-
-                    response = requests.get(url=url, headers=self.headers)
-                    if response.status_code == 200:
-
-                        raw_json_unescaped = json.loads(response.text)
-
-                        # Iterate through the list in the raw JSON data
-                        for item in raw_json_unescaped["items"]:
-                            title = item["snippet"]["title"]
-                            video_id = item["snippet"]["resourceId"]["videoId"]
-                            link = "https://www.youtube.com/watch?v=" + video_id
-
-                            # time
-                            datetime_obj = datetime.strptime(item["snippet"]["publishedAt"], "%Y-%m-%dT%H:%M:%SZ")
-                            timestamp = int(datetime_obj.timestamp())
-
-                            new_list.append(
-                                {
-                                    "title": title,
-                                    "article_id": video_id,
-                                    "author_name": author_name_l,
-                                    "author_id": author_id_l,
-                                    "channel_name": "Youtube",
-                                    "link": link,
-                                    "creation_time": str(timestamp),
-                                    "snapshot_time": str(current_time)
-                                }
-                            )
-
-                    self.articles_json = json.dumps(new_list, ensure_ascii=False)
-                    # break on success
-                    if self.articles_json:
-                        break
+        # Only the authors due according to their posting rate, the others keep their snapshot
+        authors_list = self.authors_list
+        if self.adaptive_polling:
+            due_author_ids = self.get_poll_scheduler().get_due(
+                [author['author_id'] for author in self.authors_list], current_time)
+            authors_list = [author for author in self.authors_list if author['author_id'] in due_author_ids]
+            logging.info(f'{self} polls {len(authors_list)} of {len(self.authors_list)} authors')
 
-            except Exception as error:
-                logging.exception(f"Error getting or parsing the response: {error}")
-                self.articles_json = []
+        # Fetch the authors concurrently, at most max_workers requests in flight
+        # Wrapped so that --profile counts the fetching and parsing toward this spider, not only the waiting
+        get_author_articles = profiler.wrap(self.get_author_articles)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(get_author_articles, author, current_time,
+                                       retry_times, max_results, part) for author in authors_list]
+
+        new_list = []
+        for author, future in zip(authors_list, futures):
+            articles = future.result()
+            new_list.extend(articles)
+            if self.adaptive_polling:
+                if articles:
+                    self.poll_scheduler.record_success(author['author_id'],
+                                                       [article.creation_time for article in articles], current_time)
+                else:
+                    self.poll_scheduler.record_failure(author['author_id'], current_time)
+        self.articles = new_list
+
+        self.api_key_pool.save_usage()
+        self.save_cursors()
+        if self.adaptive_polling:
+            self.poll_scheduler.flush()
 
-        # Make sure self.articles_json = [] after the number of retries is exceeded and still failed
-        if not new_list:
-            self.articles_json = []
+        # Make sure self.articles = [] when every author failed
+        if authors_list and not new_list:
             logging.warning(f"Max retries is exceeded in {self}")
             logging.warning(f"{self} is set to []")
 
+    def get_poll_scheduler(self):
+        if self.poll_scheduler is None:
+            self.poll_scheduler = PollScheduler(os.path.join(self.data_dir, 'youtube_poll_schedule.sqlite3'),
+                                                self.poll_min_interval, self.poll_max_interval)
+        return self.poll_scheduler
+
+    def load_cursors(self, cursors_path=None):
+        """
+        The cursor of an author is its last seen video and the latest videos seen,
+        {'author_id': {'article_id': '', 'creation_time': '', 'recent': [{'article_id': '', 'title': '', 'creation_time': ''}]}}
+        """
+        if cursors_path is None:
+            cursors_path = os.path.join(self.data_dir, 'youtube_cursors.json')
+        self.cursors_path = cursors_path
+
+        try:
+            with open(cursors_path, 'r', encoding='utf-8') as r:
+                self.cursors = json.load(r)
+        except FileNotFoundError:
+            self.cursors = {}
+        except Exception as error:
+            logging.exception(f'{cursors_path} read error: {error}')
+            self.cursors = {}
+
+    def save_cursors(self):
+        """
+        Merge the cursors of the authors of this run into the file, the cursors of authors crawled
+        by other workers are kept.
+        """
+        if self.cursors_path is None:
+            return
+
+        try:
+            with locked_file(self.cursors_path):
+                try:
+                    with open(self.cursors_path, 'r', encoding='utf-8') as r:
+                        cursors = json.load(r)
+                except FileNotFoundError:
+                    cursors = {}
+                cursors.update({author['author_id']: self.cursors[author['author_id']]
+                                for author in self.authors_list if author['author_id'] in self.cursors})
+                self.cursors = cursors
+
+                with open(self.cursors_path, 'w', encoding='utf-8') as w:
+                    json.dump(cursors, w, ensure_ascii=False)
+        except Exception as error:
+            logging.exception(f'{self.cursors_path} write error: {error}')
+
+    def load_api_key_pool(self, api_key_usage_path=None):
+        if api_key_usage_path is None:
+            api_key_usage_path = os.path.join(self.data_dir, 'youtube_apikey_usage.json')
+
+        try:
+            self.api_key_pool = YoutubeApiKeyPool(self.api_key_list, api_key_usage_path)
+        except Exception as error:
+            logging.exception(f'Cannot find wanted value in api_key_list: {error}')
+            self.api_key_pool = YoutubeApiKeyPool([], api_key_usage_path)
+
     def start(self, authors_list_path=None, api_key_path=None):
         if authors_list_path is None:
             module_dir = os.path.dirname(os.path.abspath(__file__))
@@ -164,8 +533,15 @@ class YoutubeSpider:
         if api_key_path is None:
             module_dir = os.path.dirname(os.path.abspath(__file__))
             api_key_path = os.path.join(module_dir, '..', 'conf', 'youtube_apikey_list.json')
+        self.cancel_event.clear()
         self.load_api_key(api_key_path)
+        self.load_api_key_pool()
+        self.load_cursors()
         self.load_authors(authors_list_path)
+        if self.author_filter is not None:
+            authors_count = len(self.authors_list)
+            self.authors_list = [author for author in self.authors_list if self.author_filter(author['author_id'])]
+            logging.info(f'{self} crawls {len(self.authors_list)} of {authors_count} authors')
         self.get_articles_list()
 
 
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Function: spiders run through a BrowserPool with a fake driver factory, no Firefox needed
+# Author: 10935336
+# Creation date: 2026-10-18
+# Modified date: 2026-10-18
+
+import threading
+import time
+import unittest
+
+from main import get_all_current_articles_lists
+from module.Article import Article
+from module.BrowserPool import BrowserPool
+
+PAGES = {
+    'https://example.com/a': 'First video',
+    'https://example.com/b': 'Second video',
+    'https://example.com/c': 'Third video',
+}
+
+
+class FakeDriver:
+    """
+    The part of a Selenium WebDriver the spiders use.
+    """
+
+    def __init__(self, drivers):
+        self.page_source = ''
+        self.quit_called = False
+        drivers.append(self)
+
+    def get(self, url):
+        # Slow enough for the spiders to overlap
+        time.sleep(0.01)
+        self.page_source = PAGES[url]
+
+    def quit(self):
+        self.quit_called = True
+
+
+class FakeBrowserSpider:
+    """
+    A Selenium spider written as the README describes, leasing its browser from the pool.
+    """
+
+    def __init__(self, pool, author_id, urls):
+        self.pool = pool
+        self.author_id = author_id
+        self.urls = urls
+        self.articles = []
+        self.cancel_event = threading.Event()
+
+    def __str__(self):
+        return f'FakeBrowserSpider {self.author_id}'
+
+    def start(self):
+        articles = []
+        for url in self.urls:
+            with self.pool.lease(timeout=5) as browser:
+                browser.get(url)
+                title = browser.driver.page_source
+            articles.append(Article(title, url, self.author_id, self.author_id, 'Test', url, '1760745600',
+                                    '1760745600'))
+        self.articles = articles
+
+
+class BrowserPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.drivers = []
+        self.pool = BrowserPool(driver_factory=lambda: FakeDriver(self.drivers), max_size=2, max_pages=3,
+                                rss_func=lambda driver: None)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_spiders_run_through_the_pool(self):
+        spiders = [FakeBrowserSpider(self.pool, f'author{i}', list(PAGES)) for i in range(4)]
+        articles_lists = get_all_current_articles_lists(spiders, max_workers=4, timeout=30)
+
+        self.assertEqual(len(articles_lists), 4)
+        for articles_list in articles_lists:
+            self.assertEqual([article.title for article in articles_list], list(PAGES.values()))
+
+        # 12 pages through at most 2 browsers at a time, each recycled after 3 pages
+        self.assertLessEqual(len(self.pool.browsers), 2)
+        self.assertEqual(len(self.drivers), 4)
+        self.assertEqual(sum(driver.quit_called for driver in self.drivers), 4 - len(self.pool.browsers))
+
+    def test_broken_browser_is_quit(self):
+        with self.assertRaises(KeyError):
+            with self.pool.lease() as browser:
+                browser.get('https://example.com/missing')
+        self.assertEqual(self.pool.browsers, [])
+        self.assertTrue(self.drivers[0].quit_called)
+
+    def test_idle_browsers_are_quit_on_close(self):
+        spider = FakeBrowserSpider(self.pool, 'author', ['https://example.com/a'])
+        spider.start()
+        self.pool.close()
+        self.assertTrue(all(driver.quit_called for driver in self.drivers))
+        with self.assertRaises(RuntimeError):
+            self.pool.acquire()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Function: near-duplicate titles are collapsed, distinct titles are not
+# Author: 10935336
+# Creation date: 2026-10-18
+# Modified date: 2026-10-18
+
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from module.Article import Article
+from module.DuplicateIndex import DuplicateIndex, merge_group
+from module.Outbox import Outbox
+from module.PushedRecords import PushedRecords
+
+NEAR_DUPLICATES = [
+    ('【Live】 Hello, World! new song', 'Hello world - new song!'),
+    ('Our new single OUT NOW: Sunrise', 'Sunrise - new single out now'),
+    ('【MV】新曲「夜明け」公開！', '新曲「夜明け」公開'),
+    ('今晚8点直播，不见不散', '今晚８点直播 不见不散！'),
+    ('Summer festival live stream tonight', 'Summer festival live stream tonight, see you'),
+]
+
+DISTINCT = [
+    ('Weekly Update #45', 'Weekly Update #46'),
+    ('Episode 12: The Return', 'Episode 13: The Return'),
+    ('New song released', 'New video released'),
+    ('今晚8点直播', '明晚8点直播'),
+    ('Hello', 'Goodbye'),
+    ('Official Trailer', 'Official Teaser Trailer'),
+]
+
+
+def make_article(title, author_name, channel_name='youtube', link='', creation_time=1760745600):
+    return Article(title, title, author_name, author_name, channel_name, link, str(creation_time),
+                   str(creation_time))
+
+
+class DuplicateIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.index = DuplicateIndex(os.path.join(self.temp_dir.name, 'index.sqlite3'))
+        self.now = datetime(2026, 10, 18, 12)
+
+    def tearDown(self):
+        self.index.close()
+        self.temp_dir.cleanup()
+
+    def test_near_duplicates_collapse_in_one_batch(self):
+        for title, other_title in NEAR_DUPLICATES:
+            with self.subTest(title=title):
+                groups, copies = self.index.collapse([make_article(title, 'team-a', 'youtube'),
+                                                      make_article(other_title, 'team-b', 'bilibili')], self.now)
+                self.assertEqual(len(groups), 1)
+                self.assertEqual(copies, [])
+
+    def test_distinct_titles_are_kept(self):
+        for title, other_title in DISTINCT:
+            with self.subTest(title=title):
+                groups, copies = self.index.collapse([make_article(title, 'team-a', 'youtube'),
+                                                      make_article(other_title, 'team-b', 'bilibili')], self.now)
+                self.assertEqual(len(groups), 2)
+                self.assertEqual(copies, [])
+
+    def test_same_author_is_never_collapsed(self):
+        groups, _ = self.index.collapse([make_article('Hello world', 'team-a'),
+                                         make_article('Hello world', 'team-a')], self.now)
+        self.assertEqual(len(groups), 2)
+
+    def test_other_teams_are_never_collapsed(self):
+        groups, _ = self.index.collapse([make_article('Hello world', 'team-a'),
+                                         make_article('Hello world', 'other-a', 'bilibili')], self.now)
+        self.assertEqual(len(groups), 2)
+
+    def test_equal_links_collapse(self):
+        groups, _ = self.index.collapse([
+            make_article('First title', 'team-a', link='https://www.example.com/post/1?utm_source=x'),
+            make_article('Something else', 'team-b', 'bilibili', link='http://example.com/post/1/'),
+        ], self.now)
+        self.assertEqual(len(groups), 1)
+
+    def test_later_copy_points_to_its_group(self):
+        groups, _ = self.index.collapse([make_article('Hello world new song', 'team-a')], self.now)
+        group_fingerprint = PushedRecords.fingerprint(merge_group(groups[0]))
+
+        later = make_article('【Live】 Hello, World! new song', 'team-b', 'bilibili')
+        groups, copies = self.index.collapse([later], self.now + timedelta(minutes=10))
+        self.assertEqual(groups, [])
+        self.assertEqual(copies, [(later, group_fingerprint)])
+
+    def test_generic_titles_days_apart_are_kept(self):
+        for title in ('今晚8点直播', 'Official Trailer', 'Hello world new song'):
+            with self.subTest(title=title):
+                self.index.collapse([make_article(title, 'team-a')], self.now)
+                groups, copies = self.index.collapse(
+                    [make_article(title, 'team-b', 'bilibili', creation_time=1760745600 + 3 * 86400)],
+                    self.now + timedelta(days=3))
+                self.assertEqual(len(groups), 1)
+                self.assertEqual(copies, [])
+
+    def test_equal_links_days_apart_are_copies(self):
+        self.index.collapse([make_article('Live', 'team-a', link='https://example.com/live/1')], self.now)
+        later = make_article('Live', 'team-b', 'bilibili', link='https://example.com/live/1',
+                             creation_time=1760745600 + 3 * 86400)
+        groups, copies = self.index.collapse([later], self.now + timedelta(days=3))
+        self.assertEqual(groups, [])
+        self.assertEqual(len(copies), 1)
+
+    def test_copies_expire(self):
+        self.index.collapse([make_article('Hello world new song', 'team-a')], self.now)
+        self.index.clean_expired(self.now + timedelta(days=8))
+        groups, copies = self.index.collapse([make_article('Hello world new song', 'team-b', 'bilibili')],
+                                             self.now + timedelta(days=8))
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(copies, [])
+
+
+class OutboxCopiesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.index = DuplicateIndex(os.path.join(self.temp_dir.name, 'index.sqlite3'))
+        self.outbox = Outbox(os.path.join(self.temp_dir.name, 'outbox.sqlite3'))
+        self.now = datetime(2026, 10, 18, 12)
+
+    def tearDown(self):
+        self.index.close()
+        self.outbox.close()
+        self.temp_dir.cleanup()
+
+    def test_later_copy_is_merged_into_queued_article(self):
+        groups, _ = self.index.collapse([make_article('Hello world new song', 'team-a', 'youtube')], self.now)
+        self.outbox.enqueue([merge_group(group) for group in groups], ['dingtalk:a', 'dingtalk:b'])
+
+        _, copies = self.index.collapse([make_article('Hello, World! New song', 'team-b', 'bilibili')],
+                                        self.now + timedelta(minutes=10))
+        self.assertEqual(self.outbox.add_copies(copies), 1)
+
+        for sink_name in ('dingtalk:a', 'dingtalk:b'):
+            _, articles = self.outbox.get_due(sink_name, 10)
+            self.assertEqual(len(articles), 1)
+            self.assertEqual(articles[0].channel_name, 'youtube / bilibili')
+            self.assertEqual(articles[0].author_name, 'team-a / team-b')
+
+    def test_copy_of_sent_article_is_dropped(self):
+        groups, _ = self.index.collapse([make_article('Hello world new song', 'team-a', 'youtube')], self.now)
+        self.outbox.enqueue([merge_group(group) for group in groups], ['dingtalk:a'])
+        ids, _ = self.outbox.get_due('dingtalk:a', 10)
+        self.outbox.ack(ids)
+
+        _, copies = self.index.collapse([make_article('Hello, World! New song', 'team-b', 'bilibili')],
+                                        self.now + timedelta(minutes=10))
+        self.assertEqual(len(copies), 1)
+        self.assertEqual(self.outbox.add_copies(copies), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()